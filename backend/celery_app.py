@@ -5,7 +5,8 @@ from backend.config import settings
 celery_app = Celery(
     "ai_assistant",
     broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
+    backend=settings.REDIS_URL,
+    include=["backend.tasks.memory"]
 )
 
 # Configure Celery
@@ -17,6 +18,15 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
+# Periodic jobs (run with `celery -A backend.celery_app beat`)
+if settings.STM_TRIM_MODE == "lazy":
+    celery_app.conf.beat_schedule = {
+        "trim-stm": {
+            "task": "backend.tasks.memory.trim_stm",
+            "schedule": settings.STM_TRIM_INTERVAL_SECONDS,
+        },
+    }
+
 # Auto-discover tasks
 celery_app.autodiscover_tasks(["backend.tasks"])
 
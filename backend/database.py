@@ -1,14 +1,166 @@
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from backend.config import settings
+from backend.utils.metrics import metrics
+from backend.utils.profiling import instrument_engine
+
+
+class PoolStats:
+    """Checkout wait, hold time and exhaustion counters for a connection pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.exhausted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.returns = 0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+        self.peak_demand = 0
+    
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+    
+    def record_attempt(self, checked_out: int, capacity: int):
+        """Note the pool level when a checkout starts (demand includes waiters; at capacity = must wait)"""
+        with self._lock:
+            self.peak_demand = max(self.peak_demand, checked_out + 1)
+            if capacity >= 0 and checked_out >= capacity:
+                self.exhausted += 1
+    
+    def record_hold(self, hold: float):
+        with self._lock:
+            self.returns += 1
+            self.total_hold += hold
+            self.max_hold = max(self.max_hold, hold)
+    
+    def to_dict(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "exhausted": self.exhausted,
+                "peak_demand": self.peak_demand,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_hold_ms": round(self.total_hold / self.returns * 1000, 3) if self.returns else 0.0,
+                "max_hold_ms": round(self.max_hold * 1000, 3)
+            }
+
+
+class _TimedPoolMixin:
+    """Time how long each checkout waits on the pool queue and how long it is held"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+    
+    def _do_get(self):
+        # max_overflow -1 means unbounded
+        capacity = self.size() + self._max_overflow if self._max_overflow >= 0 else -1
+        self.stats.record_attempt(self.checkedout(), capacity)
+        
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        conn.info["checked_out_at"] = time.perf_counter()
+        return conn
+    
+    def _do_return_conn(self, record):
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.stats.record_hold(time.perf_counter() - checked_out_at)
+        super()._do_return_conn(record)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (asyncpg / aiosqlite)"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Pool sizing and per-connection settings for an engine"""
+    options = {"echo": settings.SQL_ECHO}
+    
+    # SQLite uses its own file/singleton pools; sizing only applies to server databases
+    if make_url(url).get_backend_name() == "sqlite":
+        return options
+    
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    
+    return options
+
 
 # Create database engine
-engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, False))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the chat hot path, so DB round-trips don't block the event loop
+ASYNC_DATABASE_URL = _async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, True))
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Per-request SQL counts and timings (only collected while ProfilingMiddleware is active)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -20,3 +172,63 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of both engines' pools for sizing against worker counts"""
+    def describe(pool) -> dict:
+        stats = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+            )
+        if isinstance(pool, _TimedPoolMixin):
+            stats.update(pool.stats.to_dict())
+        return stats
+    
+    return {
+        "sync": describe(engine.pool),
+        "async": describe(async_engine.sync_engine.pool),
+    }
+
+
+def _pool_samples(read) -> list:
+    """One sample per engine whose pool has the value"""
+    samples = []
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        value = read(pool)
+        if value is not None:
+            samples.append(({"engine": name}, value))
+    return samples
+
+
+metrics.gauge(
+    "db_pool_checked_out", "Connections checked out of the pool",
+    ("engine",), collect=lambda: _pool_samples(lambda pool: pool.checkedout() if isinstance(pool, QueuePool) else None)
+)
+metrics.counter(
+    "db_pool_checkouts_total", "Connections handed out by the pool",
+    ("engine",), collect=lambda: _pool_samples(lambda pool: pool.stats.checkouts if isinstance(pool, _TimedPoolMixin) else None)
+)
+metrics.counter(
+    "db_pool_exhausted_total", "Checkouts that found every connection in use",
+    ("engine",), collect=lambda: _pool_samples(lambda pool: pool.stats.exhausted if isinstance(pool, _TimedPoolMixin) else None)
+)
+metrics.counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ("engine",), collect=lambda: _pool_samples(lambda pool: pool.stats.timeouts if isinstance(pool, _TimedPoolMixin) else None)
+)
+metrics.counter(
+    "db_pool_wait_seconds_total", "Time spent waiting for a pooled connection",
+    ("engine",), collect=lambda: _pool_samples(lambda pool: pool.stats.total_wait if isinstance(pool, _TimedPoolMixin) else None)
+)
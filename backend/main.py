@@ -1,17 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from backend.config import settings
-from backend.database import Base, engine
-from backend.routers import tasks, preferences, chat, settings as settings_router, activity
+from backend.services.admission import AdmissionRejected
+from backend.services.ai_service import ai_service
+from backend.services.providers import ProviderError
+from backend.utils.metrics import metrics, MetricsMiddleware
+from backend.utils.profiling import ProfilingMiddleware
+from backend.utils.serialization import FastJSONResponse
+from backend.routers import tasks, preferences, chat, settings as settings_router, activity, system
+
+# Schema is managed by Alembic migrations (python init_db.py / alembic upgrade head)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open provider connections on startup, close them on shutdown"""
+    await ai_service.startup()
+    yield
+    await ai_service.shutdown()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description="Personal AI Assistant Backend with multi-model support",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS - allow all origins for Replit environment
@@ -21,14 +38,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the client to page through GET /api/tasks
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-request profiles and SQL stats; not installed at all unless configured
+if settings.PROFILE_ALL_REQUESTS or settings.PROFILE_TOKEN or settings.SQL_QUERY_STATS:
+    app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so latency includes CORS handling and error responses
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """429 (rate limited) / 503 (overloaded) with Retry-After"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+
+
+@app.exception_handler(ProviderError)
+async def provider_error_handler(request: Request, exc: ProviderError):
+    """502 / 503 / 504 when the model provider (and its fallback) failed"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+
+
 # Include routers
 app.include_router(tasks.router)
 app.include_router(preferences.router)
 app.include_router(chat.router)
 app.include_router(settings_router.router)
 app.include_router(activity.router)
+app.include_router(system.router)
 
 
 @app.get("/")
@@ -41,6 +81,12 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics for Prometheus to scrape (text exposition format)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
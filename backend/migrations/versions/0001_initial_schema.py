@@ -0,0 +1,77 @@
+"""Initial schema (tables as previously created by Base.metadata.create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "short_term_memory",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("model_used", sa.String(), nullable=True),
+        sa.Column("conversation_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_short_term_memory_id", "short_term_memory", ["id"])
+    op.create_index("ix_short_term_memory_user_id", "short_term_memory", ["user_id"])
+    op.create_index("ix_short_term_memory_conversation_id", "short_term_memory", ["conversation_id"])
+
+    op.create_table(
+        "long_term_memory",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.JSON(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_long_term_memory_id", "long_term_memory", ["id"])
+    op.create_index("ix_long_term_memory_user_id", "long_term_memory", ["user_id"])
+    op.create_index("ix_long_term_memory_key", "long_term_memory", ["key"])
+
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_tasks_id", "tasks", ["id"])
+    op.create_index("ix_tasks_user_id", "tasks", ["user_id"])
+
+    op.create_table(
+        "preferences",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("communication_style", sa.String(), nullable=True),
+        sa.Column("theme", sa.String(), nullable=True),
+        sa.Column("language", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_preferences_id", "preferences", ["id"])
+    op.create_index("ix_preferences_user_id", "preferences", ["user_id"])
+
+
+def downgrade():
+    op.drop_table("preferences")
+    op.drop_table("tasks")
+    op.drop_table("long_term_memory")
+    op.drop_table("short_term_memory")
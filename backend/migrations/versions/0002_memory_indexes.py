@@ -0,0 +1,59 @@
+"""Composite indexes for STM access patterns, unique (user_id, key) on LTM
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # STM: composite indexes replace the single-column ones they lead with
+    op.create_index(
+        "ix_stm_conversation_created", "short_term_memory", ["conversation_id", "created_at"]
+    )
+    op.create_index(
+        "ix_stm_user_role_created", "short_term_memory", ["user_id", "role", "created_at"]
+    )
+    op.drop_index("ix_short_term_memory_conversation_id", table_name="short_term_memory")
+    op.drop_index("ix_short_term_memory_user_id", table_name="short_term_memory")
+
+    # LTM: keep only the newest row per (user_id, key) before enforcing uniqueness
+    op.execute(
+        """
+        DELETE FROM long_term_memory
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id, key
+                    ORDER BY COALESCE(updated_at, created_at) DESC, id DESC
+                ) AS position
+                FROM long_term_memory
+            ) ranked
+            WHERE position > 1
+        )
+        """
+    )
+    op.drop_index("ix_long_term_memory_user_id", table_name="long_term_memory")
+    op.drop_index("ix_long_term_memory_key", table_name="long_term_memory")
+    with op.batch_alter_table("long_term_memory") as batch_op:
+        batch_op.create_unique_constraint("uq_ltm_user_key", ["user_id", "key"])
+
+
+def downgrade():
+    with op.batch_alter_table("long_term_memory") as batch_op:
+        batch_op.drop_constraint("uq_ltm_user_key", type_="unique")
+    op.create_index("ix_long_term_memory_key", "long_term_memory", ["key"])
+    op.create_index("ix_long_term_memory_user_id", "long_term_memory", ["user_id"])
+
+    op.create_index("ix_short_term_memory_user_id", "short_term_memory", ["user_id"])
+    op.create_index("ix_short_term_memory_conversation_id", "short_term_memory", ["conversation_id"])
+    op.drop_index("ix_stm_user_role_created", table_name="short_term_memory")
+    op.drop_index("ix_stm_conversation_created", table_name="short_term_memory")
@@ -0,0 +1,24 @@
+"""Cached token count on STM rows for token-budgeted context
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: existing rows are counted on read until they age out of STM
+    op.add_column("short_term_memory", sa.Column("token_count", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("short_term_memory") as batch_op:
+        batch_op.drop_column("token_count")
@@ -0,0 +1,24 @@
+"""Embedding on LTM entries for similarity retrieval
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: entries are embedded on first retrieval
+    op.add_column("long_term_memory", sa.Column("embedding", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("long_term_memory") as batch_op:
+        batch_op.drop_column("embedding")
@@ -0,0 +1,29 @@
+"""Composite indexes for keyset pagination of tasks
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (created_at, id) is the page key; the composite indexes replace the user_id one they lead with
+    op.create_index("ix_tasks_user_created", "tasks", ["user_id", "created_at", "id"])
+    op.create_index(
+        "ix_tasks_user_completed_created", "tasks", ["user_id", "completed", "created_at", "id"]
+    )
+    op.drop_index("ix_tasks_user_id", table_name="tasks")
+
+
+def downgrade():
+    op.create_index("ix_tasks_user_id", "tasks", ["user_id"])
+    op.drop_index("ix_tasks_user_completed_created", table_name="tasks")
+    op.drop_index("ix_tasks_user_created", table_name="tasks")
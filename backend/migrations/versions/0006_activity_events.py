@@ -0,0 +1,63 @@
+"""Append-only activity feed, backfilled from messages, completed tasks and preferences
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "activity_events",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("subject_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_activity_user_created", "activity_events", ["user_id", "created_at", "id"])
+
+    # Backfill what the feed used to compute per request; event ids reuse the source row ids
+    op.execute(
+        """
+        INSERT INTO activity_events (id, user_id, type, title, description, subject_id, created_at)
+        SELECT id, COALESCE(user_id, 'default_user'), 'message', 'New conversation',
+               CASE WHEN length(content) > 50 THEN substr(content, 1, 50) || '...' ELSE content END,
+               id, created_at
+        FROM short_term_memory
+        WHERE role = 'user' AND created_at IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO activity_events (id, user_id, type, title, description, subject_id, created_at)
+        SELECT id, COALESCE(user_id, 'default_user'), 'task', 'Task completed', title,
+               id, COALESCE(updated_at, created_at)
+        FROM tasks
+        WHERE completed = true AND COALESCE(updated_at, created_at) IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO activity_events (id, user_id, type, title, description, subject_id, created_at)
+        SELECT id, COALESCE(user_id, 'default_user'), 'preference', 'Preferences updated',
+               'Changed to ' || communication_style || ' style', id, updated_at
+        FROM preferences
+        WHERE updated_at IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_activity_user_created", table_name="activity_events")
+    op.drop_table("activity_events")
@@ -2,5 +2,6 @@ from backend.models.stm import ShortTermMemory
 from backend.models.ltm import LongTermMemory
 from backend.models.task import Task
 from backend.models.preference import Preference
+from backend.models.activity import ActivityEvent
 
-__all__ = ["ShortTermMemory", "LongTermMemory", "Task", "Preference"]
+__all__ = ["ShortTermMemory", "LongTermMemory", "Task", "Preference", "ActivityEvent"]
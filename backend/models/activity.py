@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, DateTime, Index
+from sqlalchemy.sql import func
+from datetime import datetime, timezone
+from backend.database import Base
+from backend.utils.serialization import as_utc
+
+
+class ActivityEvent(Base):
+    """
+    Append-only feed of user activity (messages, task completions, preference updates)
+    Written in the same transaction as the change it records; never updated.
+    """
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        # Feed pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC (keyset on both)
+        Index("ix_activity_user_created", "user_id", "created_at", "id"),
+    )
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False, default="default_user")
+    type = Column(String, nullable=False)  # 'message', 'task' or 'preference'
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    subject_id = Column(String, nullable=True)  # The message, task or preference row
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False
+    )
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "title": self.title,
+            "description": self.description,
+            "timestamp": as_utc(self.created_at)
+        }
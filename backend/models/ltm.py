@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy import Column, String, Text, DateTime, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from backend.database import Base
 
@@ -9,12 +9,17 @@ class LongTermMemory(Base):
     Persists critical data for personalization
     """
     __tablename__ = "long_term_memory"
+    __table_args__ = (
+        # One entry per key per user; lets save_to_ltm upsert with ON CONFLICT
+        UniqueConstraint("user_id", "key", name="uq_ltm_user_key"),
+    )
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, index=True, default="default_user")
-    key = Column(String, nullable=False, index=True)  # e.g., 'user_preferences', 'important_facts'
+    user_id = Column(String, default="default_user")
+    key = Column(String, nullable=False)  # e.g., 'user_preferences', 'important_facts'
     value = Column(JSON, nullable=False)  # Flexible JSON storage
     description = Column(Text, nullable=True)  # Human-readable description
+    embedding = Column(JSON, nullable=True)  # Vector for similarity retrieval; reset when value changes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
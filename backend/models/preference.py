@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, DateTime
 from sqlalchemy.sql import func
 from backend.database import Base
+from backend.utils.serialization import as_utc
 
 
 class Preference(Base):
@@ -16,12 +17,15 @@ class Preference(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def to_dict(self):
+        """
+        Response fields (PreferenceResponse), sent without re-validation
+        Datetimes are normalized to UTC and left to the JSON encoder (backend.utils.serialization).
+        """
         return {
             "id": self.id,
-            "user_id": self.user_id,
             "communicationStyle": self.communication_style,
             "theme": self.theme,
             "language": self.language,
-            "createdAt": self.created_at.isoformat() if self.created_at else None,
-            "updatedAt": self.updated_at.isoformat() if self.updated_at else None
+            "createdAt": as_utc(self.created_at),
+            "updatedAt": as_utc(self.updated_at)
         }
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Text, DateTime, Integer
+from sqlalchemy import Column, String, Text, DateTime, Integer, Index
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from backend.database import Base
 
 
@@ -9,14 +10,26 @@ class ShortTermMemory(Base):
     Keeps only the last 5 conversations for context
     """
     __tablename__ = "short_term_memory"
+    __table_args__ = (
+        # Context building / trimming: WHERE conversation_id = ? ORDER BY created_at
+        Index("ix_stm_conversation_created", "conversation_id", "created_at"),
+        # Recent activity: WHERE user_id = ? AND role = ? ORDER BY created_at
+        Index("ix_stm_user_role_created", "user_id", "role", "created_at"),
+    )
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, index=True, default="default_user")
+    user_id = Column(String, default="default_user")
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     model_used = Column(String, nullable=True)  # Which model was used for this response
-    conversation_id = Column(String, index=True)  # Group messages by conversation
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    conversation_id = Column(String)  # Group messages by conversation
+    token_count = Column(Integer, nullable=True)  # Cached for context budgeting; NULL on rows from before it existed
+    # Set client-side too: trimming ranks by created_at, and SQLite's now() only has second resolution
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now()
+    )
     
     def to_dict(self):
         return {
@@ -26,5 +39,6 @@ class ShortTermMemory(Base):
             "content": self.content,
             "model_used": self.model_used,
             "conversation_id": self.conversation_id,
+            "token_count": self.token_count,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
@@ -1,27 +1,43 @@
-from sqlalchemy import Column, String, Text, Boolean, DateTime
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Index
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from backend.database import Base
+from backend.utils.serialization import as_utc
 
 
 class Task(Base):
     """Task model for task management"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Task list pages: WHERE user_id = ? ORDER BY created_at, id (keyset on both)
+        Index("ix_tasks_user_created", "user_id", "created_at", "id"),
+        # Same, filtered by completed
+        Index("ix_tasks_user_completed_created", "user_id", "completed", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, index=True, default="default_user")
+    user_id = Column(String, default="default_user")
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     completed = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client-side too: pages are keyed on created_at, and SQLite's now() only has second resolution
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now()
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def to_dict(self):
+        """
+        Response fields (TaskResponse), sent without re-validation
+        Datetimes are normalized to UTC and left to the JSON encoder (backend.utils.serialization).
+        """
         return {
             "id": self.id,
-            "user_id": self.user_id,
             "title": self.title,
             "description": self.description,
             "completed": self.completed,
-            "createdAt": self.created_at.isoformat() if self.created_at else None,
-            "updatedAt": self.updated_at.isoformat() if self.updated_at else None
+            "createdAt": as_utc(self.created_at),
+            "updatedAt": as_utc(self.updated_at)
         }
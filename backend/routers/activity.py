@@ -1,67 +1,26 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from backend.database import get_db
-from backend.models.stm import ShortTermMemory
-from backend.models.task import Task
-from backend.models.preference import Preference
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from backend.config import settings
+from backend.database import get_async_db
+from backend.services.activity_service import activity_service
+from backend.utils.pagination import InvalidCursor
+from backend.utils.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/api/activity", tags=["activity"])
 
 
 @router.get("/recent")
-def get_recent_activity(db: Session = Depends(get_db)):
-    """Get recent user activity across all features"""
+async def get_recent_activity(
+    limit: int = Query(settings.ACTIVITY_PAGE_SIZE, ge=1, le=settings.ACTIVITY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get recent user activity across all features, newest first; older pages via the X-Next-Cursor header"""
     user_id = "default_user"
-    activities = []
-    
-    # Get recent messages
-    recent_messages = db.query(ShortTermMemory).filter(
-        ShortTermMemory.user_id == user_id,
-        ShortTermMemory.role == "user"
-    ).order_by(ShortTermMemory.created_at.desc()).limit(3).all()
-    
-    for msg in recent_messages:
-        activities.append({
-            "id": msg.id,
-            "type": "message",
-            "title": "New conversation",
-            "description": msg.content[:50] + "..." if len(msg.content) > 50 else msg.content,
-            "timestamp": msg.created_at.isoformat() if msg.created_at else datetime.utcnow().isoformat()
-        })
-    
-    # Get recent tasks
-    recent_tasks = db.query(Task).filter(
-        Task.user_id == user_id,
-        Task.completed == True
-    ).order_by(Task.updated_at.desc()).limit(2).all()
-    
-    for task in recent_tasks:
-        activities.append({
-            "id": task.id,
-            "type": "task",
-            "title": "Task completed",
-            "description": task.title,
-            "timestamp": task.updated_at.isoformat() if task.updated_at else datetime.utcnow().isoformat()
-        })
-    
-    # Get preference updates
-    prefs = db.query(Preference).filter(
-        Preference.user_id == user_id
-    ).order_by(Preference.updated_at.desc()).limit(1).all()
-    
-    for pref in prefs:
-        if pref.updated_at:
-            activities.append({
-                "id": pref.id,
-                "type": "preference",
-                "title": "Preferences updated",
-                "description": f"Changed to {pref.communication_style} style",
-                "timestamp": pref.updated_at.isoformat()
-            })
-    
-    # Sort by timestamp
-    activities.sort(key=lambda x: x["timestamp"], reverse=True)
-    
-    return activities[:5]  # Return top 5 most recent
+    try:
+        events, next_cursor = await activity_service.get_recent(db, user_id, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    return FastJSONResponse(events, headers=headers)
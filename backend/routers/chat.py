@@ -1,97 +1,351 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from backend.database import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Awaitable, Callable, Dict
+from backend.config import settings
+from backend.database import get_async_db, AsyncSessionLocal
+from backend.services.admission import AdmissionRejected
 from backend.services.ai_service import ai_service
-from backend.services.memory_service import memory_service
-from backend.schemas.chat import ChatRequest, ChatResponse
-import json
+from backend.services.memory_service import memory_service, ChatTurn
+from backend.services.providers import ProviderError
+from backend.utils.metrics import metrics
+from backend.utils.serialization import FastJSONResponse, dumps_text, loads
+from backend.schemas.chat import ChatRequest, ChatResponse, WebSocketChatRequest
+from pydantic import ValidationError
+import asyncio
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Compared against DB pool usage in /api/system/db/pool: sockets must not pin connections
+websocket_stats = {"open_connections": 0, "requests_in_flight": 0}
+
+metrics.gauge(
+    "websocket_connections", "Open chat WebSockets",
+    collect=lambda: [({}, websocket_stats["open_connections"])]
+)
+metrics.gauge(
+    "websocket_requests_in_flight", "Chat requests running on WebSockets",
+    collect=lambda: [({}, websocket_stats["requests_in_flight"])]
+)
+
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
-    """WebSocket endpoint for real-time chat"""
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    WebSocket endpoint for real-time chat
+    
+    Each chat frame runs as its own task with its own database session, so
+    several requests can be in flight on one connection. Every reply frame
+    carries the request's request_id (sent by the client or generated), and
+    {"type": "cancel", "request_id": ...} aborts that request and its
+    provider call.
+    """
     await websocket.accept()
+    connection = _ChatConnection(websocket)
+    websocket_stats["open_connections"] += 1
     
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            request_data = json.loads(data)
-            
-            message = request_data.get("message")
-            model_size = request_data.get("model_size", "medium")
-            conversation_id = request_data.get("conversation_id") or str(uuid.uuid4())
-            user_id = "default_user"
+            try:
+                request_data = loads(data)
+            except ValueError:  # orjson.JSONDecodeError and json.JSONDecodeError both subclass it
+                await connection.send({"type": "error", "error": "Invalid JSON", "request_id": None})
+                continue
             
-            # Save user message to STM
-            memory_service.add_to_stm(
-                db, user_id, "user", message, conversation_id
-            )
+            if not isinstance(request_data, dict):
+                await connection.send({"type": "error", "error": "Expected a JSON object", "request_id": None})
+            elif request_data.get("type") == "cancel":
+                await connection.cancel(request_data.get("request_id"))
+            else:
+                await connection.start(request_data)
+    
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    except Exception:
+        logger.exception("WebSocket error")
+        await websocket.close()
+    finally:
+        connection.cancel_all()
+        websocket_stats["open_connections"] -= 1
+
+
+class _ChatConnection:
+    """In-flight chat requests of one WebSocket, keyed by request_id"""
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+    
+    async def send(self, payload: dict):
+        """Send one frame; concurrent requests share the socket"""
+        async with self._send_lock:
+            await self.websocket.send_text(dumps_text(payload))
+    
+    async def start(self, request_data: dict):
+        """Run a chat request in the background"""
+        request_id = request_data.get("request_id") or str(uuid.uuid4())
+        conversation_id = request_data.get("conversation_id") or str(uuid.uuid4())
+        
+        error = None
+        if request_id in self.tasks:
+            error = "A request with this request_id is already in flight"
+        elif len(self.tasks) >= settings.WS_MAX_IN_FLIGHT:
+            error = f"Too many requests in flight on this connection (max {settings.WS_MAX_IN_FLIGHT})"
+        if error:
+            await self.send({"type": "error", "error": error, "conversation_id": conversation_id, "request_id": request_id})
+            return
+        
+        task = asyncio.create_task(self._run(request_id, conversation_id, request_data))
+        self.tasks[request_id] = task
+        task.add_done_callback(lambda _: self._forget(request_id, task))
+    
+    def _forget(self, request_id: str, task: asyncio.Task):
+        # The id may already belong to a newer request if this one was cancelled
+        if self.tasks.get(request_id) is task:
+            del self.tasks[request_id]
+    
+    async def cancel(self, request_id: str):
+        """Abort an in-flight request; nothing of it is written to STM"""
+        task = self.tasks.pop(request_id, None)
+        if task is None:
+            await self.send({"type": "error", "error": "No request in flight with this request_id", "request_id": request_id})
+            return
+        
+        task.cancel()
+        await self.send({"type": "cancelled", "request_id": request_id})
+    
+    def cancel_all(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+    
+    async def _run(self, request_id: str, conversation_id: str, request_data: dict):
+        try:
+            request = WebSocketChatRequest.model_validate(request_data)
+        except ValidationError as e:
+            await self.send({
+                "type": "error",
+                "error": "Invalid chat request",
+                "status": 422,
+                "detail": e.errors(include_url=False, include_context=False, include_input=False),
+                "conversation_id": conversation_id,
+                "request_id": request_id
+            })
+            return
+        
+        message = request.message
+        user_id = "default_user"
+        
+        # Session per request: it holds a pooled connection only while reading
+        # context and while writing the turn, never across the model call
+        websocket_stats["requests_in_flight"] += 1
+        try:
+            # User message is written together with the reply
+            turn = memory_service.begin_turn(user_id, conversation_id, message)
             
-            # Get AI response
-            try:
-                response_content, model_used = await ai_service.get_model_response(
-                    message, model_size, db, conversation_id, user_id
-                )
+            async with AsyncSessionLocal() as db:
+                if request.stream:
+                    await _stream_to_websocket(self.send, db, turn, request.model_size, request_id, request.bypass_cache)
+                    return
                 
-                # Save assistant response to STM
-                assistant_message = memory_service.add_to_stm(
-                    db, user_id, "assistant", response_content, conversation_id, model_used
+                # Get AI response
+                response_content, model_used = await ai_service.get_model_response(
+                    message, request.model_size, db, conversation_id, user_id, request.bypass_cache
                 )
                 
-                # Send response back to client
-                response = {
-                    "id": assistant_message.id,
-                    "role": "assistant",
-                    "content": response_content,
-                    "model_used": model_used,
-                    "conversation_id": conversation_id
-                }
-                
-                await websocket.send_text(json.dumps(response))
+                # Save user message and assistant response to STM (a late cancel no longer discards it)
+                assistant_message = turn.reply(response_content, model_used)
+                await _commit_detached(turn)
             
-            except Exception as e:
-                error_response = {
-                    "error": str(e),
-                    "conversation_id": conversation_id
-                }
-                await websocket.send_text(json.dumps(error_response))
+            # Send response back to client
+            await self.send({
+                "id": assistant_message.id,
+                "role": "assistant",
+                "content": response_content,
+                "model_used": model_used,
+                "conversation_id": conversation_id,
+                "request_id": request_id
+            })
+        
+        except (AdmissionRejected, ProviderError) as e:
+            # Nothing is written to STM: the turn is only committed with a real reply
+            await self.send({
+                "type": "error",
+                "error": e.detail,
+                "status": e.status_code,
+                "retry_after": e.headers.get("Retry-After"),
+                "conversation_id": conversation_id,
+                "request_id": request_id
+            })
+        except Exception as e:
+            logger.exception("WebSocket chat request %s failed", request_id)
+            await self.send({
+                "type": "error",
+                "error": str(e) or type(e).__name__,
+                "status": 500,
+                "conversation_id": conversation_id,
+                "request_id": request_id
+            })
+        finally:
+            websocket_stats["requests_in_flight"] -= 1
+
+
+# Keeps detached commits referenced until they finish
+_pending_commits = set()
+
+
+async def _commit_detached(turn: ChatTurn):
+    """
+    Commit the turn in a task with its own session
     
-    except WebSocketDisconnect:
-        print("Client disconnected")
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-        await websocket.close()
+    Once the reply exists it is written even if the request is cancelled or
+    the socket closes meanwhile: the cancel stops the wait, not the commit,
+    and the request's own session can close without taking the write with it.
+    """
+    task = asyncio.create_task(_commit_in_own_session(turn))
+    _pending_commits.add(task)
+    task.add_done_callback(_pending_commits.discard)
+    await asyncio.shield(task)
+
+
+async def _commit_in_own_session(turn: ChatTurn):
+    async with AsyncSessionLocal() as db:
+        await memory_service.commit_turn(db, turn)
+
+
+async def _stream_to_websocket(
+    send: Callable[[dict], Awaitable[None]],
+    db: AsyncSession,
+    turn: ChatTurn,
+    model_size: str,
+    request_id: str,
+    bypass_cache: bool = False
+):
+    """
+    Send a streamed response as start/delta/done frames
+    
+    The turn is written to STM once, after the last delta.
+    """
+    conversation_id = turn.conversation_id
+    deltas, model_used = await ai_service.stream_model_response(
+        turn.user_message.content, model_size, db, conversation_id, turn.user_id, bypass_cache
+    )
+    
+    await send({
+        "type": "start",
+        "model_used": model_used,
+        "conversation_id": conversation_id,
+        "request_id": request_id
+    })
+    
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        await send({
+            "type": "delta",
+            "content": delta,
+            "conversation_id": conversation_id,
+            "request_id": request_id
+        })
+    
+    response_content = "".join(parts)
+    assistant_message = turn.reply(response_content, model_used)
+    await _commit_detached(turn)
+    
+    await send({
+        "type": "done",
+        "id": assistant_message.id,
+        "role": "assistant",
+        "content": response_content,
+        "model_used": model_used,
+        "conversation_id": conversation_id,
+        "request_id": request_id
+    })
 
 
 @router.post("/message", response_model=ChatResponse)
-async def send_message(request: ChatRequest, db: Session = Depends(get_db)):
+async def send_message(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
     """REST endpoint for chat (alternative to WebSocket)"""
     user_id = "default_user"
     conversation_id = request.conversation_id or str(uuid.uuid4())
     
-    # Save user message to STM
-    memory_service.add_to_stm(
-        db, user_id, "user", request.message, conversation_id
-    )
+    # User message is written together with the reply
+    turn = memory_service.begin_turn(user_id, conversation_id, request.message)
     
     # Get AI response
     response_content, model_used = await ai_service.get_model_response(
-        request.message, request.model_size, db, conversation_id, user_id
+        request.message, request.model_size, db, conversation_id, user_id, request.bypass_cache
     )
     
-    # Save assistant response to STM
-    assistant_message = memory_service.add_to_stm(
-        db, user_id, "assistant", response_content, conversation_id, model_used
+    # Save user message and assistant response to STM
+    assistant_message = turn.reply(response_content, model_used)
+    await memory_service.commit_turn(db, turn)
+    
+    # Built from known-good values: skip re-validation against ChatResponse
+    return FastJSONResponse({
+        "id": assistant_message.id,
+        "role": "assistant",
+        "content": response_content,
+        "model_used": model_used,
+        "conversation_id": conversation_id
+    })
+
+
+@router.post("/message/stream")
+async def stream_message(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
+    """Server-Sent Events variant of the REST chat endpoint"""
+    user_id = "default_user"
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    
+    # User message is written together with the reply
+    turn = memory_service.begin_turn(user_id, conversation_id, request.message)
+    
+    deltas, model_used = await ai_service.stream_model_response(
+        request.message, request.model_size, db, conversation_id, user_id, request.bypass_cache
     )
     
-    return ChatResponse(
-        id=assistant_message.id,
-        role="assistant",
-        content=response_content,
-        model_used=model_used,
-        conversation_id=conversation_id
+    async def event_stream():
+        yield _sse_event("start", {
+            "model_used": model_used,
+            "conversation_id": conversation_id
+        })
+        
+        parts = []
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                yield _sse_event("delta", {"content": delta})
+        except ProviderError as e:
+            # The stream broke off: report it and keep the partial reply out of STM
+            yield _sse_event("error", {"detail": e.detail, "status": e.status_code})
+            return
+        
+        # Save user message and assembled assistant response to STM
+        response_content = "".join(parts)
+        assistant_message = turn.reply(response_content, model_used)
+        await memory_service.commit_turn(db, turn)
+        
+        yield _sse_event("done", {
+            "id": assistant_message.id,
+            "role": "assistant",
+            "content": response_content,
+            "model_used": model_used,
+            "conversation_id": conversation_id
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Events frame"""
+    return f"event: {event}\ndata: {dumps_text(data)}\n\n"
@@ -1,29 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_async_db
 from backend.models.preference import Preference
 from backend.schemas.preference import PreferenceCreate, PreferenceUpdate, PreferenceResponse
+from backend.services.activity_service import activity_service, preference_event
 from backend.services.memory_service import memory_service
+from backend.utils.serialization import FastJSONResponse
 import uuid
 
 router = APIRouter(prefix="/api/preferences", tags=["preferences"])
 
 
+async def _get_user_preference(db: AsyncSession, user_id: str) -> Preference:
+    """Get the preference row for a user, if any"""
+    result = await db.execute(select(Preference).where(Preference.user_id == user_id))
+    return result.scalars().first()
+
+
 @router.post("/", response_model=PreferenceResponse)
-def create_preference(pref: PreferenceCreate, db: Session = Depends(get_db)):
+async def create_preference(pref: PreferenceCreate, db: AsyncSession = Depends(get_async_db)):
     """Create or update user preferences"""
     user_id = "default_user"
     
     # Check if preferences already exist
-    existing = db.query(Preference).filter(Preference.user_id == user_id).first()
+    existing = await _get_user_preference(db, user_id)
     
     if existing:
         # Update existing
         existing.communication_style = pref.communication_style
         existing.theme = pref.theme
         existing.language = pref.language
-        db.commit()
-        db.refresh(existing)
+        db.add(preference_event(user_id, existing.id, pref.communication_style))
+        await db.commit()
+        await db.refresh(existing)
+        await activity_service.invalidate(user_id)
         preference = existing
     else:
         # Create new
@@ -35,11 +46,11 @@ def create_preference(pref: PreferenceCreate, db: Session = Depends(get_db)):
             language=pref.language
         )
         db.add(preference)
-        db.commit()
-        db.refresh(preference)
+        await db.commit()
+        await db.refresh(preference)
     
     # Also save to LTM for AI context
-    memory_service.save_to_ltm(
+    await memory_service.save_to_ltm(
         db,
         user_id,
         "user_preferences",
@@ -51,14 +62,14 @@ def create_preference(pref: PreferenceCreate, db: Session = Depends(get_db)):
         "User's personalization preferences"
     )
     
-    return preference.to_dict()
+    return FastJSONResponse(preference.to_dict())
 
 
 @router.get("/", response_model=PreferenceResponse)
-def get_preferences(db: Session = Depends(get_db)):
+async def get_preferences(db: AsyncSession = Depends(get_async_db)):
     """Get user preferences"""
     user_id = "default_user"
-    preference = db.query(Preference).filter(Preference.user_id == user_id).first()
+    preference = await _get_user_preference(db, user_id)
     
     if not preference:
         # Return defaults
@@ -71,14 +82,14 @@ def get_preferences(db: Session = Depends(get_db)):
             "updatedAt": None
         }
     
-    return preference.to_dict()
+    return FastJSONResponse(preference.to_dict())
 
 
 @router.put("/", response_model=PreferenceResponse)
-def update_preferences(pref_data: PreferenceUpdate, db: Session = Depends(get_db)):
+async def update_preferences(pref_data: PreferenceUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update user preferences"""
     user_id = "default_user"
-    preference = db.query(Preference).filter(Preference.user_id == user_id).first()
+    preference = await _get_user_preference(db, user_id)
     
     if not preference:
         raise HTTPException(status_code=404, detail="Preferences not found")
@@ -86,12 +97,14 @@ def update_preferences(pref_data: PreferenceUpdate, db: Session = Depends(get_db
     update_dict = pref_data.model_dump(exclude_unset=True)
     for field, value in update_dict.items():
         setattr(preference, field, value)
+    db.add(preference_event(user_id, preference.id, preference.communication_style))
     
-    db.commit()
-    db.refresh(preference)
+    await db.commit()
+    await db.refresh(preference)
+    await activity_service.invalidate(user_id)
     
     # Update LTM
-    memory_service.save_to_ltm(
+    await memory_service.save_to_ltm(
         db,
         user_id,
         "user_preferences",
@@ -103,4 +116,4 @@ def update_preferences(pref_data: PreferenceUpdate, db: Session = Depends(get_db
         "User's personalization preferences"
     )
     
-    return preference.to_dict()
+    return FastJSONResponse(preference.to_dict())
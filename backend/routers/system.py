@@ -0,0 +1,47 @@
+from fastapi import APIRouter
+from backend.database import get_pool_stats
+from backend.services.memory_service import system_message_cache
+from backend.services.activity_service import activity_cache
+from backend.services.ltm_index import ltm_index
+from backend.services.admission import admission
+from backend.services.ai_service import ai_service
+from backend.services.providers import prompt_cache_stats
+from backend.routers.chat import websocket_stats
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/db/pool")
+def get_db_pool_stats():
+    """Connection pool usage (checked-out, overflow, checkout wait/hold time, exhaustion) and open WebSockets"""
+    return {**get_pool_stats(), "websockets": websocket_stats}
+
+
+@router.get("/cache")
+def get_cache_stats():
+    """Cache sizes and hit/miss counters, and the providers' prompt cache hit ratio per model"""
+    return {
+        "ltm_system_message": system_message_cache.info(),
+        "response": ai_service.response_cache.info(),
+        "ltm_facts": ltm_index.info(),
+        "activity": activity_cache.info(),
+        "prompt": prompt_cache_stats.info()
+    }
+
+
+@router.get("/models")
+def get_model_stats():
+    """Rolling latency and error rate per model, and model_size="auto" decisions"""
+    return ai_service.router.info()
+
+
+@router.get("/admission")
+def get_admission_stats():
+    """Provider calls in flight, wait queue depth and wait time, rejections"""
+    return admission.info()
+
+
+@router.get("/providers")
+def get_provider_stats():
+    """Circuit breaker state per provider, retries, failovers and hedged requests"""
+    return ai_service.caller.info()
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+from backend.config import settings
 from backend.database import get_db
-from backend.schemas.task import TaskCreate, TaskUpdate, TaskResponse
+from backend.schemas.task import TaskCreate, TaskUpdate, TaskResponse, TaskBatchRequest, TaskBatchResponse
+from backend.services.activity_service import activity_service
 from backend.services.task_service import task_service
+from backend.utils.pagination import InvalidCursor
+from backend.utils.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
@@ -11,14 +15,44 @@ router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 @router.post("/", response_model=TaskResponse)
 def create_task(task: TaskCreate, db: Session = Depends(get_db)):
     """Create a new task"""
-    return task_service.create_task(db, task).to_dict()
+    created = task_service.create_task(db, task)
+    if created.completed:
+        activity_service.invalidate_from_thread(created.user_id)
+    return FastJSONResponse(created.to_dict())
+
+
+@router.post("/batch", response_model=TaskBatchResponse)
+def batch_tasks(batch: TaskBatchRequest, db: Session = Depends(get_db)):
+    """Create, update and delete tasks in one request and one transaction, with a result per operation"""
+    if len(batch.operations) > settings.TASKS_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.TASKS_BATCH_MAX_OPERATIONS} operations per batch"
+        )
+    results = task_service.apply_batch(db, batch.operations)
+    activity_service.invalidate_from_thread("default_user")
+    return FastJSONResponse({"results": results})
 
 
 @router.get("/", response_model=List[TaskResponse])
-def get_tasks(db: Session = Depends(get_db)):
-    """Get all tasks"""
-    tasks = task_service.get_tasks(db)
-    return [task.to_dict() for task in tasks]
+def get_tasks(
+    limit: int = Query(settings.TASKS_PAGE_SIZE, ge=1, le=settings.TASKS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    completed: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200, description="Case-insensitive title search"),
+    order: Literal["asc", "desc"] = Query("asc", description="By creation time"),
+    db: Session = Depends(get_db)
+):
+    """Get a page of tasks; the next page's cursor is in the X-Next-Cursor header (absent on the last page)"""
+    try:
+        tasks, next_cursor = task_service.get_tasks(
+            db, limit=limit, cursor=cursor, completed=completed, search=q, order=order
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    # Rows straight to JSON: the response_model only documents the shape
+    return FastJSONResponse([task.to_dict() for task in tasks], headers=headers)
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
@@ -27,7 +61,7 @@ def get_task(task_id: str, db: Session = Depends(get_db)):
     task = task_service.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task.to_dict()
+    return FastJSONResponse(task.to_dict())
 
 
 @router.put("/{task_id}", response_model=TaskResponse)
@@ -36,7 +70,9 @@ def update_task(task_id: str, task_data: TaskUpdate, db: Session = Depends(get_d
     task = task_service.update_task(db, task_id, task_data)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task.to_dict()
+    if task.completed:
+        activity_service.invalidate_from_thread(task.user_id)
+    return FastJSONResponse(task.to_dict())
 
 
 @router.delete("/{task_id}")
@@ -9,8 +9,15 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    model_size: Literal["small", "medium", "large"] = "medium"
+    model_size: Literal["small", "medium", "large", "auto"] = "medium"
     conversation_id: Optional[str] = None
+    bypass_cache: bool = False  # Skip the response cache for this request
+
+
+class WebSocketChatRequest(ChatRequest):
+    """Chat frame on /api/chat/ws"""
+    request_id: Optional[str] = None  # Echoed on every reply frame; generated when absent
+    stream: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import datetime
 
 
@@ -25,3 +25,38 @@ class TaskResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class TaskCreateOperation(TaskCreate):
+    op: Literal["create"]
+
+
+class TaskUpdateOperation(TaskUpdate):
+    op: Literal["update"]
+    id: str
+
+
+class TaskDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: str
+
+
+TaskOperation = Annotated[
+    Union[TaskCreateOperation, TaskUpdateOperation, TaskDeleteOperation],
+    Field(discriminator="op")
+]
+
+
+class TaskBatchRequest(BaseModel):
+    operations: List[TaskOperation]
+
+
+class TaskBatchResult(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: str
+    status: Literal["created", "updated", "deleted", "not_found"]
+    task: Optional[TaskResponse] = None  # The task after a create or update
+
+
+class TaskBatchResponse(BaseModel):
+    results: List[TaskBatchResult]  # One per operation, in request order
@@ -0,0 +1,121 @@
+"""
+Activity feed
+Events are appended where the activity happens (chat turns, task completions,
+preference updates), in the same transaction, so the feed is one indexed read.
+"""
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import anyio
+import uuid
+from backend.config import settings
+from backend.models.activity import ActivityEvent
+from backend.utils.cache import create_cache
+from backend.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime, timezone
+
+
+# Newest events per user (up to ACTIVITY_MAX_PAGE_SIZE + 1); invalidated whenever one is appended
+activity_cache = create_cache(
+    settings.ACTIVITY_CACHE_BACKEND,
+    "activity_feed",
+    settings.ACTIVITY_CACHE_MAX_ENTRIES,
+    settings.ACTIVITY_CACHE_TTL_SECONDS
+)
+
+
+def new_activity_event(
+    user_id: str,
+    type: str,
+    title: str,
+    description: Optional[str] = None,
+    subject_id: Optional[str] = None
+) -> ActivityEvent:
+    """Build an event with client-side id and timestamp, to add to the caller's transaction"""
+    return ActivityEvent(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        type=type,
+        title=title,
+        description=description,
+        subject_id=subject_id,
+        created_at=datetime.now(timezone.utc)
+    )
+
+
+def message_event(user_id: str, message_id: str, content: str) -> ActivityEvent:
+    description = content[:50] + "..." if len(content) > 50 else content
+    return new_activity_event(user_id, "message", "New conversation", description, message_id)
+
+
+def task_completed_event(user_id: str, task_id: str, title: str) -> ActivityEvent:
+    return new_activity_event(user_id, "task", "Task completed", title, task_id)
+
+
+def preference_event(user_id: str, preference_id: str, communication_style: str) -> ActivityEvent:
+    return new_activity_event(
+        user_id, "preference", "Preferences updated", f"Changed to {communication_style} style", preference_id
+    )
+
+
+def _as_datetime(timestamp) -> datetime:
+    """An event's timestamp: a datetime when read from the database, "...Z" text from the Redis cache"""
+    return timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(timestamp)
+
+
+class ActivityService:
+    """Reads of the activity feed"""
+    
+    @staticmethod
+    async def get_recent(
+        db: AsyncSession,
+        user_id: str = "default_user",
+        limit: int = 5,
+        cursor: Optional[str] = None
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        One page of a user's activity, newest first
+        
+        The first page of any size up to ACTIVITY_MAX_PAGE_SIZE is served from
+        the per-user cache; later pages (with a cursor) always read the
+        (user_id, created_at, id) index.
+        
+        Returns:
+            The events, and the cursor for the next page (None on the last page)
+        """
+        if cursor is None:
+            events = await activity_cache.get(user_id)
+            if events is None:
+                events = await ActivityService._read(db, user_id, settings.ACTIVITY_MAX_PAGE_SIZE + 1)
+                await activity_cache.set(user_id, events)
+        else:
+            events = await ActivityService._read(db, user_id, limit + 1, decode_cursor(cursor))
+        
+        if len(events) <= limit:
+            return events, None
+        page = events[:limit]
+        last = page[-1]
+        return page, encode_cursor(_as_datetime(last["timestamp"]), last["id"])
+    
+    @staticmethod
+    async def _read(db: AsyncSession, user_id: str, limit: int, after: Optional[tuple] = None) -> list[dict]:
+        query = select(ActivityEvent).where(ActivityEvent.user_id == user_id)
+        if after is not None:
+            query = query.where(tuple_(ActivityEvent.created_at, ActivityEvent.id) < tuple_(*after))
+        query = query.order_by(ActivityEvent.created_at.desc(), ActivityEvent.id.desc()).limit(limit)
+        result = await db.execute(query)
+        return [event.to_dict() for event in result.scalars()]
+    
+    @staticmethod
+    async def invalidate(user_id: str):
+        """Call after committing events for the user"""
+        await activity_cache.delete(user_id)
+    
+    @staticmethod
+    def invalidate_from_thread(user_id: str):
+        """invalidate() for sync (def) endpoints, which run in the threadpool"""
+        anyio.from_thread.run(activity_cache.delete, user_id)
+
+
+activity_service = ActivityService()
@@ -0,0 +1,229 @@
+"""
+Admission control for model calls
+Per-user token buckets at the door, then global and per-model concurrency
+limits with a bounded, time-limited wait queue in front of the providers.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from backend.config import settings
+from backend.utils.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """A request that was not admitted; maps to an HTTP status with Retry-After"""
+    
+    status_code = 503
+    
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+    
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class RateLimited(AdmissionRejected):
+    """The user exceeded their request rate"""
+    
+    status_code = 429
+
+
+class Overloaded(AdmissionRejected):
+    """Provider capacity is exhausted and the wait queue is full or timed out"""
+    
+    status_code = 503
+
+
+class TokenBucket:
+    """Allows `burst` requests at once, refilled at `rate` per second"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    def take(self) -> float:
+        """Consume a token; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionSlot:
+    """Held global + model permits; release() is idempotent"""
+    
+    def __init__(self, controller: "AdmissionController", model: str):
+        self._controller = controller
+        self._model = model
+        self._released = False
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._model)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Bounds provider fan-out for this worker
+    
+    check_rate(user_id) is called when a chat request arrives; acquire(model)
+    right before the provider call, and the slot is held until the response
+    (or stream) ends. Requests wait in a queue of at most ADMISSION_MAX_QUEUE
+    for up to ADMISSION_QUEUE_TIMEOUT seconds; beyond that they are rejected
+    with 503 instead of piling onto the providers. Failover and hedged calls to
+    a fallback model take their own slot with try_acquire(), which never waits.
+    """
+    
+    def __init__(self):
+        self._global = asyncio.Semaphore(settings.ADMISSION_MAX_CONCURRENT)
+        self._models: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.in_flight: Dict[str, int] = {}
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.timed_out = 0
+        self.fallback_busy = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def check_rate(self, user_id: str):
+        """Raise RateLimited if the user is over ADMISSION_USER_RATE_PER_MINUTE"""
+        if settings.ADMISSION_USER_RATE_PER_MINUTE <= 0:
+            return
+        
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(settings.ADMISSION_USER_RATE_PER_MINUTE / 60, settings.ADMISSION_USER_BURST)
+            self._buckets[user_id] = bucket
+            # Oldest buckets are full again by now, so forgetting them is harmless
+            while len(self._buckets) > 10000:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_id)
+        
+        retry_after = bucket.take()
+        if retry_after:
+            self.rate_limited += 1
+            raise RateLimited("Rate limit exceeded, slow down", retry_after)
+    
+    def _model_semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._models:
+            self._models[model] = asyncio.Semaphore(settings.ADMISSION_MAX_CONCURRENT_PER_MODEL)
+        return self._models[model]
+    
+    async def acquire(self, model: str) -> AdmissionSlot:
+        """Wait for a global and a per-model permit, or raise Overloaded"""
+        model_semaphore = self._model_semaphore(model)
+        if not self._global.locked() and not model_semaphore.locked():
+            await model_semaphore.acquire()
+            await self._global.acquire()
+            return self._admit(model, 0.0)
+        
+        if self.waiting >= settings.ADMISSION_MAX_QUEUE:
+            self.queue_full += 1
+            raise Overloaded("Server is busy, try again shortly", settings.ADMISSION_QUEUE_TIMEOUT)
+        
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.monotonic()
+        model_held = False
+        try:
+            # Model permit first: waiting on a saturated model must not hold a global permit
+            async with asyncio.timeout(settings.ADMISSION_QUEUE_TIMEOUT):
+                await model_semaphore.acquire()
+                model_held = True
+                await self._global.acquire()
+        except BaseException as e:
+            if model_held:
+                model_semaphore.release()
+            if isinstance(e, TimeoutError):
+                self.timed_out += 1
+                raise Overloaded("Timed out waiting for model capacity", settings.ADMISSION_QUEUE_TIMEOUT)
+            raise
+        finally:
+            self.waiting -= 1
+        
+        return self._admit(model, time.monotonic() - started)
+    
+    async def try_acquire(self, model: str) -> Optional[AdmissionSlot]:
+        """A global and a per-model permit if both are free right now, else None"""
+        model_semaphore = self._model_semaphore(model)
+        if self._global.locked() or model_semaphore.locked():
+            self.fallback_busy += 1
+            return None
+        # Neither acquire suspends while its semaphore is unlocked
+        await model_semaphore.acquire()
+        await self._global.acquire()
+        return self._admit(model, 0.0)
+    
+    def _admit(self, model: str, wait: float) -> AdmissionSlot:
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        return AdmissionSlot(self, model)
+    
+    def _release(self, model: str):
+        self.in_flight[model] -= 1
+        self._model_semaphore(model).release()
+        self._global.release()
+    
+    def info(self) -> dict:
+        return {
+            "max_concurrent": settings.ADMISSION_MAX_CONCURRENT,
+            "max_concurrent_per_model": settings.ADMISSION_MAX_CONCURRENT_PER_MODEL,
+            "max_queue": settings.ADMISSION_MAX_QUEUE,
+            "in_flight": dict(self.in_flight),
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": {
+                "rate_limited": self.rate_limited,
+                "queue_full": self.queue_full,
+                "timed_out": self.timed_out,
+                "fallback_busy": self.fallback_busy
+            },
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 3) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3)
+        }
+
+
+admission = AdmissionController()
+
+metrics.gauge(
+    "admission_in_flight", "Provider calls holding an admission slot",
+    ("model",), collect=lambda: [({"model": model}, count) for model, count in admission.in_flight.items()]
+)
+metrics.gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot",
+    collect=lambda: [({}, admission.waiting)]
+)
+metrics.counter(
+    "admission_rejected_total", "Requests rejected by admission control",
+    ("reason",), collect=lambda: [
+        ({"reason": "rate_limited"}, admission.rate_limited),
+        ({"reason": "queue_full"}, admission.queue_full),
+        ({"reason": "timed_out"}, admission.timed_out),
+        ({"reason": "fallback_busy"}, admission.fallback_busy)
+    ]
+)
@@ -1,80 +1,526 @@
-from typing import List, Dict, Optional
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
+from typing import List, Dict, Optional, AsyncIterator, Awaitable, Callable, TypeVar
+import asyncio
+import time
+import weakref
+import httpx
 from backend.config import settings
 from backend.models.stm import ShortTermMemory
 from backend.models.ltm import LongTermMemory
-from sqlalchemy.orm import Session
+from backend.services.admission import admission, AdmissionSlot, Overloaded
+from backend.services.ltm_index import ltm_index, fact_text, UserFacts
+from backend.services.memory_service import (
+    system_message_cache, summary_key, enqueue_fact_embeddings, SUMMARY_KEY_PREFIX, PINNED_LTM_KEYS
+)
+from backend.services.model_router import ModelRouter, SIZES, model_for_size
+from backend.services.providers import Provider, ProviderError, CACHE_BREAKPOINT, prompt_cache_stats, default_registry
+from backend.services.resilience import ResilientCaller
+from backend.services.response_cache import ResponseCache
+from backend.utils.cache import create_cache
+from backend.utils.metrics import metrics, chat_stage_duration
+from backend.utils.tokens import count_tokens, tokenizer, MESSAGE_OVERHEAD_TOKENS
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+T = TypeVar("T")
 
 
 class AIService:
     """Service for handling AI model interactions with STM/LTM context"""
     
     def __init__(self):
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
-        self.anthropic_client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
+        # Providers create their clients on startup (FastAPI lifespan) or lazily on first use
+        self.providers = default_registry()
+        self.router = ModelRouter()
+        # Retries, circuit breakers and failover/hedging; every attempt feeds the router's stats
+        self.caller = ResilientCaller(self.providers, self.router.record)
+        
+        # Opt-in cache of responses to repeated prompts
+        self.response_cache = ResponseCache(
+            create_cache(
+                settings.RESPONSE_CACHE_BACKEND,
+                "response",
+                settings.RESPONSE_CACHE_MAX_ENTRIES,
+                settings.RESPONSE_CACHE_TTL_SECONDS
+            ),
+            embedder=self._embed if settings.RESPONSE_CACHE_SEMANTIC else None,
+            similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+            max_semantic_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS
+        )
+    
+    async def startup(self):
+        """Create provider clients and pre-open their connections"""
+        await self.providers.start()
+    
+    async def shutdown(self):
+        """Close provider clients and their connection pools"""
+        await self.providers.close()
+    
+    def _get_timeout(self, model: str) -> httpx.Timeout:
+        """Request timeout by model size (larger models take longer to answer)"""
+        timeouts = {
+            settings.SMALL_MODEL: settings.SMALL_MODEL_TIMEOUT,
+            settings.MEDIUM_MODEL: settings.MEDIUM_MODEL_TIMEOUT,
+            settings.LARGE_MODEL: settings.LARGE_MODEL_TIMEOUT
+        }
+        return httpx.Timeout(
+            timeouts.get(model, settings.MEDIUM_MODEL_TIMEOUT),
+            connect=settings.PROVIDER_CONNECT_TIMEOUT
+        )
     
     async def get_model_response(
         self,
         message: str,
         model_size: str,
-        db: Session,
+        db: AsyncSession,
         conversation_id: str,
-        user_id: str = "default_user"
+        user_id: str = "default_user",
+        bypass_cache: bool = False
     ) -> tuple[str, str]:
         """
         Get AI response using selected model size with STM/LTM context
         
         Returns: (response_content, model_name_used)
+        Raises: AdmissionRejected when rate limited or out of provider capacity,
+            ProviderError when the model and its fallback both failed
+        """
+        admission.check_rate(user_id)
+        messages, model_name = await self._prepare_request(
+            message, model_size, db, conversation_id, user_id
+        )
+        
+        use_cache = settings.RESPONSE_CACHE_ENABLED and not bypass_cache
+        if use_cache:
+            cached = await self.response_cache.get(model_name, messages)
+            if cached is not None:
+                return cached, model_name
+        
+        with chat_stage_duration.time(stage="admission_wait", model=model_name):
+            slot = await admission.acquire(model_name)
+        async with slot:
+            started = time.perf_counter()
+            response, model_used = await self.caller.call(
+                model_name,
+                lambda provider, model: self._admitted(
+                    model_name, model, lambda: provider.complete(messages, model, self._get_timeout(model))
+                )
+            )
+        chat_stage_duration.observe(time.perf_counter() - started, stage="provider_total", model=model_used)
+        
+        if use_cache:
+            await self.response_cache.set(model_name, messages, response)
+        
+        return response, model_used
+    
+    async def stream_model_response(
+        self,
+        message: str,
+        model_size: str,
+        db: AsyncSession,
+        conversation_id: str,
+        user_id: str = "default_user",
+        bypass_cache: bool = False
+    ) -> tuple[AsyncIterator[str], str]:
+        """
+        Stream AI response deltas using selected model size with STM/LTM context
+        
+        Returns: (async iterator of text deltas, model_name_used)
+        Raises: AdmissionRejected when rate limited or out of provider capacity,
+            ProviderError when neither the model nor its fallback started
+            answering; the iterator raises ProviderError if a stream breaks off
+        """
+        admission.check_rate(user_id)
+        messages, model_name = await self._prepare_request(
+            message, model_size, db, conversation_id, user_id
+        )
+        
+        use_cache = settings.RESPONSE_CACHE_ENABLED and not bypass_cache
+        if use_cache:
+            cached = await self.response_cache.get(model_name, messages)
+            if cached is not None:
+                return self._replay(cached), model_name
+        
+        # Admitted and opened before returning, so a rejection or a provider
+        # failure surfaces before any frame is sent
+        with chat_stage_duration.time(stage="admission_wait", model=model_name):
+            slot = await admission.acquire(model_name)
+        started = time.perf_counter()
+        try:
+            (first, rest), model_used = await self.caller.call(
+                model_name,
+                lambda provider, model: self._open_stream(provider, model, messages, model_name),
+                discard=lambda opened: opened[1].aclose(),
+                record_success=False
+            )
+        except BaseException:
+            slot.release()
+            raise
+        if model_used != model_name:
+            # The fallback answered under its own slot, held by its stream
+            slot.release()
+        chat_stage_duration.observe(time.perf_counter() - started, stage="provider_ttft", model=model_used)
+        
+        deltas = self._track_stream(self._hold_slot(self._chain(first, rest), slot), model_used, started)
+        
+        if use_cache:
+            deltas = self._cache_stream(deltas, model_name, messages)
+        
+        return deltas, model_used
+    
+    @staticmethod
+    async def _fallback_slot(primary: str, model: str) -> Optional[AdmissionSlot]:
         """
+        Admission slot for a failover or hedged call to the fallback model
+        
+        The caller already holds the primary model's slot. A fallback call takes
+        its own without waiting, so it counts against the fallback's per-model
+        limit and the global one; with none free the call is not made.
+        """
+        if model == primary:
+            return None
+        slot = await admission.try_acquire(model)
+        if slot is None:
+            raise Overloaded(f"No capacity left for fallback model {model}", settings.ADMISSION_QUEUE_TIMEOUT)
+        return slot
+    
+    async def _admitted(self, primary: str, model: str, run: Callable[[], Awaitable[T]]) -> T:
+        """Run a provider call, holding a slot of its own when it goes to the fallback model"""
+        slot = await self._fallback_slot(primary, model)
+        if slot is None:
+            return await run()
+        async with slot:
+            return await run()
+    
+    async def _open_stream(
+        self,
+        provider: Provider,
+        model: str,
+        messages: List[Dict],
+        primary: str
+    ) -> tuple[Optional[str], AsyncIterator[str]]:
+        """Start a provider stream and wait for its first delta, so failures before any output can be retried"""
+        slot = await self._fallback_slot(primary, model)
+        deltas = provider.stream(messages, model, self._get_timeout(model))
+        if slot is not None:
+            deltas = self._hold_slot(deltas, slot)
+        try:
+            return await anext(deltas), deltas
+        except StopAsyncIteration:
+            return None, deltas
+        except BaseException:
+            await deltas.aclose()
+            if slot is not None:
+                slot.release()
+            raise
+    
+    @staticmethod
+    async def _chain(first: Optional[str], rest: AsyncIterator[str]) -> AsyncIterator[str]:
+        """The first delta, then the rest of the stream"""
+        if first is not None:
+            yield first
+        async for delta in rest:
+            yield delta
+    
+    @staticmethod
+    async def _replay(response: str) -> AsyncIterator[str]:
+        """Serve a cached response as a single delta"""
+        yield response
+    
+    @staticmethod
+    def _hold_slot(deltas: AsyncIterator[str], slot: AdmissionSlot) -> AsyncIterator[str]:
+        """Keep the admission slot until the stream ends, is closed, or is dropped unread"""
+        async def held():
+            try:
+                async for delta in deltas:
+                    yield delta
+            finally:
+                slot.release()
+        
+        stream = held()
+        weakref.finalize(stream, slot.release)
+        return stream
+    
+    async def _track_stream(self, deltas: AsyncIterator[str], model_name: str, started: float) -> AsyncIterator[str]:
+        """Pass deltas through and record the full stream duration for routing and metrics"""
+        try:
+            async for delta in deltas:
+                yield delta
+        except ProviderError:
+            self.router.record(model_name, (time.perf_counter() - started) * 1000, False)
+            raise
+        elapsed = time.perf_counter() - started
+        self.router.record(model_name, elapsed * 1000, True)
+        chat_stage_duration.observe(elapsed, stage="provider_total", model=model_name)
+    
+    async def _cache_stream(
+        self,
+        deltas: AsyncIterator[str],
+        model_name: str,
+        messages: List[Dict]
+    ) -> AsyncIterator[str]:
+        """Pass deltas through and cache the assembled response once complete"""
+        parts = []
+        async for delta in deltas:
+            parts.append(delta)
+            yield delta
+        
+        await self.response_cache.set(model_name, messages, "".join(parts))
+    
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        """Embedding vector for text (None when OpenAI is not configured)"""
+        provider = self.providers.get("openai")
+        if provider is None:
+            return None
+        return await provider.embed(text)
+    
+    async def _embed_many(self, texts: List[str]) -> Optional[List[List[float]]]:
+        provider = self.providers.get("openai")
+        if provider is None:
+            return None
+        return await provider.embed_many(texts)
+    
+    async def _prepare_request(
+        self,
+        message: str,
+        model_size: str,
+        db: AsyncSession,
+        conversation_id: str,
+        user_id: str
+    ) -> tuple[List[Dict], str]:
+        """Build the provider message list and resolve the model name"""
+        started = time.perf_counter()
+        
         # Get context from STM and LTM
-        context = await self._build_context(db, user_id, conversation_id)
+        context, token_counts, system_count = await self._build_context(db, user_id, conversation_id, message)
         
-        # Select model based on size
-        model_name = self._get_model_name(model_size)
+        # Select model based on size (or on the prompt and live latency for "auto")
+        model_name = self._get_model_name(model_size, message, context)
         
-        # Build messages with context
-        messages = context + [{"role": "user", "content": message}]
+        # Build messages with as much context as the model's token budget allows
+        messages = self._fit_context(context, token_counts, system_count, message, model_name)
         
-        # Get response based on model provider
-        if model_size in ["small", "medium"]:
-            # OpenAI models
-            response = await self._get_openai_response(messages, model_name)
-        else:
-            # Anthropic model for large
-            response = await self._get_anthropic_response(messages, model_name)
+        # End the read transaction: the pooled connection goes back while the model
+        # answers, and the session checks one out again only to write the turn
+        await db.commit()
         
-        return response, model_name
+        chat_stage_duration.observe(time.perf_counter() - started, stage="context_build", model=model_name)
+        return messages, model_name
     
-    async def _build_context(self, db: Session, user_id: str, conversation_id: str) -> List[Dict]:
-        """Build context from STM and LTM"""
-        messages = []
+    async def _build_context(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        conversation_id: str,
+        message: str
+    ) -> tuple[List[Dict], List[int], int]:
+        """
+        Build context from STM and LTM, with the token count of each message
         
-        # Get LTM (user preferences and important info)
-        ltm_entries = db.query(LongTermMemory).filter(
-            LongTermMemory.user_id == user_id
-        ).all()
+        Ordered for provider-side prompt caching, most stable first: the system
+        message (pinned LTM, which changes only when the user's LTM does), the
+        conversation summary (rewritten once per STM eviction batch), the STM
+        history, and last the LTM facts retrieved for this message, as a system
+        note just before it.
+        
+        Returns:
+            The messages, their token counts, and how many leading system
+            messages (system message and summary) there are
+        """
+        messages = []
+        token_counts = []
         
         # Build system message with LTM context
-        system_context = self._build_system_message(ltm_entries)
+        system_context = await self._get_system_message(db, user_id)
         if system_context:
             messages.append({"role": "system", "content": system_context})
+            token_counts.append(count_tokens(system_context))
+        
+        # Summary of messages already trimmed from STM, as its own block so
+        # rewriting it leaves the system message's cache entry intact
+        if settings.STM_SUMMARY_ENABLED:
+            summary = await self._get_conversation_summary(db, user_id, conversation_id)
+            if summary:
+                summary_note = f"Summary of the earlier conversation:\n{summary}"
+                messages.append({"role": "system", "content": summary_note})
+                token_counts.append(count_tokens(summary_note))
+        system_count = len(messages)
         
-        # Get STM (recent conversation history)
-        stm_entries = db.query(ShortTermMemory).filter(
-            ShortTermMemory.conversation_id == conversation_id
-        ).order_by(ShortTermMemory.created_at.desc()).limit(
-            settings.STM_CONVERSATION_LIMIT * 2  # Get last 5 exchanges (10 messages)
-        ).all()
+        # Get STM (recent conversation history); the token budget decides how much of it is sent
+        stm_result = await db.execute(
+            select(
+                ShortTermMemory.role,
+                ShortTermMemory.content,
+                ShortTermMemory.token_count
+            ).where(
+                ShortTermMemory.conversation_id == conversation_id
+            ).order_by(ShortTermMemory.created_at.desc()).limit(
+                # Everything STM retains for the conversation, including rows awaiting batch eviction
+                (settings.STM_CONVERSATION_LIMIT + settings.STM_EVICTION_BATCH) * 2
+            )
+        )
+        stm_entries = stm_result.all()
         
         # Add STM to messages (reverse to get chronological order)
-        for entry in reversed(stm_entries):
-            messages.append({
-                "role": entry.role,
-                "content": entry.content
-            })
+        for role, content, token_count in reversed(stm_entries):
+            messages.append({"role": role, "content": content})
+            # Rows written before token counts were stored are counted here
+            token_counts.append(token_count if token_count is not None else count_tokens(content))
+        
+        # LTM facts most relevant to this message, so the prompt stays the same size as LTM grows
+        facts = await self._retrieve_facts(db, user_id, message)
+        if facts:
+            note = "Relevant facts about the user:\n" + "\n".join(f"- {fact}" for fact in facts)
+            messages.append({"role": "system", "content": note})
+            token_counts.append(count_tokens(note))
+        
+        return messages, token_counts, system_count
+    
+    def _fit_context(
+        self,
+        context: List[Dict],
+        token_counts: List[int],
+        system_count: int,
+        message: str,
+        model: str
+    ) -> List[Dict]:
+        """
+        Fit the system messages, STM history, facts note and new message into the model's token budget
+        
+        The new message is always sent. The system message and summary may
+        together use up to half the budget (truncated beyond that) and the facts
+        note is sent whole if it fits. The remainder is filled with the most
+        recent history, whole messages only; when it does not all fit, the
+        oldest is dropped in steps of STM_EVICTION_BATCH exchanges, so where the
+        history starts changes every few turns rather than every turn. Each
+        system message and the last history message are cache breakpoints:
+        that prefix is what the next turn repeats.
+        """
+        budget = self._get_context_budget(model)
+        used = count_tokens(message)
+        system = []
+        note = []
+        history = list(zip(context, token_counts))
+        
+        max_system_tokens = budget // 2
+        system_used = 0
+        for system_message, system_tokens in history[:system_count]:
+            if system_used + system_tokens > max_system_tokens:
+                remaining = max_system_tokens - system_used
+                if remaining <= MESSAGE_OVERHEAD_TOKENS:
+                    break
+                system_message = {
+                    "role": "system",
+                    "content": tokenizer.truncate(system_message["content"], remaining - MESSAGE_OVERHEAD_TOKENS)
+                }
+                system_tokens = remaining
+            system.append({**system_message, CACHE_BREAKPOINT: True})
+            system_used += system_tokens
+        used += system_used
+        history = history[system_count:]
+        
+        if history and history[-1][0]["role"] == "system":
+            note_message, note_tokens = history.pop()
+            if used + note_tokens <= budget:
+                note = [note_message]
+                used += note_tokens
         
-        return messages
+        step = max(settings.STM_EVICTION_BATCH, 1) * 2
+        history_tokens = sum(tokens for _, tokens in history)
+        start = 0
+        while start < len(history) and used + history_tokens > budget:
+            history_tokens -= sum(tokens for _, tokens in history[start:start + step])
+            start += step
+        kept = [entry for entry, _ in history[start:]]
+        
+        # History must not open with a reply whose question was cut off
+        while kept and kept[0]["role"] == "assistant":
+            kept.pop(0)
+        
+        if kept:
+            kept[-1] = {**kept[-1], CACHE_BREAKPOINT: True}
+        
+        return system + kept + note + [{"role": "user", "content": message}]
+    
+    def _get_context_budget(self, model: str) -> int:
+        """Prompt token budget by model size"""
+        budgets = {
+            settings.SMALL_MODEL: settings.SMALL_MODEL_CONTEXT_TOKENS,
+            settings.MEDIUM_MODEL: settings.MEDIUM_MODEL_CONTEXT_TOKENS,
+            settings.LARGE_MODEL: settings.LARGE_MODEL_CONTEXT_TOKENS
+        }
+        return budgets.get(model, settings.MEDIUM_MODEL_CONTEXT_TOKENS)
+    
+    async def _get_system_message(self, db: AsyncSession, user_id: str) -> str:
+        """Get the rendered system message, from cache when LTM is unchanged"""
+        system_context = await system_message_cache.get(user_id)
+        if system_context is not None:
+            return system_context
+        
+        # Get LTM (user preferences and important info; facts and summaries are added per request)
+        ltm_result = await db.execute(
+            select(LongTermMemory).where(
+                LongTermMemory.user_id == user_id,
+                LongTermMemory.key.in_(PINNED_LTM_KEYS)
+            )
+        )
+        ltm_entries = ltm_result.scalars().all()
+        
+        system_context = self._build_system_message(ltm_entries)
+        await system_message_cache.set(user_id, system_context)
+        return system_context
+    
+    async def _retrieve_facts(self, db: AsyncSession, user_id: str, message: str) -> List[str]:
+        """Top LTM_RETRIEVAL_TOP_K facts by similarity to the message (all of them if there are fewer)"""
+        facts = ltm_index.get(user_id)
+        if facts is None:
+            facts = await self._load_facts(db, user_id)
+            ltm_index.set(user_id, facts)
+        
+        top_k = settings.LTM_RETRIEVAL_TOP_K
+        if len(facts) <= top_k:
+            return facts.texts
+        return facts.search(await self._embed(message), top_k)
+    
+    async def _load_facts(self, db: AsyncSession, user_id: str) -> UserFacts:
+        """
+        Load a user's retrievable LTM entries and index them off the event loop
+        
+        Facts without a vector yet are handed to the embed_ltm_facts task and
+        served by recency until this worker's index is next rebuilt.
+        """
+        result = await db.execute(
+            select(
+                LongTermMemory.key,
+                LongTermMemory.value,
+                LongTermMemory.description,
+                LongTermMemory.embedding
+            ).where(
+                LongTermMemory.user_id == user_id,
+                LongTermMemory.key.not_in(PINNED_LTM_KEYS),
+                LongTermMemory.key.not_like(f"{SUMMARY_KEY_PREFIX}%")
+            ).order_by(func.coalesce(LongTermMemory.updated_at, LongTermMemory.created_at).desc())
+        )
+        rows = result.all()
+        texts = [fact_text(row.key, row.value, row.description) for row in rows]
+        vectors = [row.embedding for row in rows]
+        
+        # Only needed once there are more facts than fit in the prompt
+        if len(rows) > settings.LTM_RETRIEVAL_TOP_K and not all(vectors):
+            enqueue_fact_embeddings(user_id)
+        
+        # Building the index (HNSW especially) is CPU-bound
+        return await asyncio.to_thread(UserFacts, texts, vectors)
+    
+    async def _get_conversation_summary(self, db: AsyncSession, user_id: str, conversation_id: str) -> Optional[str]:
+        """Rolling summary written by the summarize_stm task, if any"""
+        value = await db.scalar(
+            select(LongTermMemory.value).where(
+                LongTermMemory.user_id == user_id,
+                LongTermMemory.key == summary_key(conversation_id)
+            )
+        )
+        return value.get("summary") if value else None
     
     def _build_system_message(self, ltm_entries: List[LongTermMemory]) -> str:
         """Build system message from LTM data"""
@@ -94,53 +540,44 @@ class AIService:
         
         return "\n".join(context_parts)
     
-    def _get_model_name(self, model_size: str) -> str:
+    def _get_model_name(self, model_size: str, message: str, context: List[Dict]) -> str:
         """Get model name based on size"""
-        models = {
-            "small": settings.SMALL_MODEL,
-            "medium": settings.MEDIUM_MODEL,
-            "large": settings.LARGE_MODEL
-        }
-        return models.get(model_size, settings.MEDIUM_MODEL)
-    
-    async def _get_openai_response(self, messages: List[Dict], model: str) -> str:
-        """Get response from OpenAI"""
-        if not self.openai_client:
-            return "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
-        
-        try:
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error getting OpenAI response: {str(e)}"
-    
-    async def _get_anthropic_response(self, messages: List[Dict], model: str) -> str:
-        """Get response from Anthropic"""
-        if not self.anthropic_client:
-            return "Anthropic API key not configured. Please set ANTHROPIC_API_KEY environment variable."
-        
-        try:
-            # Extract system message if present
-            system_msg = ""
-            user_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_msg = msg["content"]
-                else:
-                    user_messages.append(msg)
-            
-            response = await self.anthropic_client.messages.create(
-                model=model,
-                max_tokens=1024,
-                system=system_msg if system_msg else None,
-                messages=user_messages
-            )
-            return response.content[0].text
-        except Exception as e:
-            return f"Error getting Anthropic response: {str(e)}"
-
+        if model_size == "auto":
+            candidates = [size for size in SIZES if self.providers.serves(model_for_size(size))]
+            model_size = self.router.choose(message, context, candidates)
+        return model_for_size(model_size)
 
 ai_service = AIService()
+
+metrics.gauge(
+    "provider_circuit_open", "1 while a provider's circuit breaker is open",
+    ("provider",), collect=lambda: [
+        ({"provider": name}, int(breaker.state == "open")) for name, breaker in ai_service.caller.breakers.items()
+    ]
+)
+metrics.counter(
+    "provider_retries_total", "Provider calls retried after a transient failure",
+    collect=lambda: [({}, ai_service.caller.retries)]
+)
+metrics.counter(
+    "provider_failovers_total", "Model calls handed to the fallback after the primary failed",
+    collect=lambda: [({}, ai_service.caller.failovers)]
+)
+metrics.counter(
+    "provider_hedges_total", "Hedged requests sent to the fallback",
+    collect=lambda: [({}, ai_service.caller.hedges)]
+)
+metrics.counter(
+    "provider_input_tokens_total", "Prompt tokens sent to each model, cached ones included",
+    ("provider", "model"), collect=lambda: [
+        ({"provider": provider, "model": model}, input_tokens)
+        for (provider, model), input_tokens, _ in prompt_cache_stats.samples()
+    ]
+)
+metrics.counter(
+    "provider_cached_input_tokens_total", "Prompt tokens the provider served from its prompt cache",
+    ("provider", "model"), collect=lambda: [
+        ({"provider": provider, "model": model}, cached_tokens)
+        for (provider, model), _, cached_tokens in prompt_cache_stats.samples()
+    ]
+)
@@ -0,0 +1,149 @@
+"""
+Vector index over a user's LTM facts
+Brute-force NumPy search for small users; an approximate (HNSW) backend for
+users with many facts, when hnswlib is installed.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from backend.config import settings
+
+
+def fact_text(key: str, value, description: str = None) -> str:
+    """How an LTM entry is embedded and shown to the model"""
+    if isinstance(value, dict) and set(value) == {"text"}:
+        value = value["text"]
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return f"{description or key}: {value}"
+
+
+def _unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class NumpyIndex:
+    """Exact cosine search over a dense matrix"""
+    
+    backend = "numpy"
+    
+    def __init__(self, vectors: List[List[float]]):
+        self._matrix = _unit_rows(vectors)
+    
+    def search(self, vector: List[float], k: int) -> List[int]:
+        query = _unit_rows([vector])[0]
+        similarities = self._matrix @ query
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        return top[np.argsort(-similarities[top])].tolist()
+
+
+class HNSWIndex:
+    """Approximate cosine search (hnswlib); sublinear in the number of facts"""
+    
+    backend = "hnsw"
+    
+    def __init__(self, vectors: List[List[float]]):
+        import hnswlib
+        matrix = _unit_rows(vectors)
+        self._index = hnswlib.Index(space="cosine", dim=matrix.shape[1])
+        self._index.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+        self._index.add_items(matrix, np.arange(len(matrix)))
+        self._size = len(matrix)
+    
+    def search(self, vector: List[float], k: int) -> List[int]:
+        k = min(k, self._size)
+        self._index.set_ef(max(50, k * 2))
+        labels, _ = self._index.knn_query(_unit_rows([vector]), k=k)
+        return labels[0].tolist()
+
+
+def build_vector_index(vectors: List[List[float]]):
+    """NumPy for small sets; the configured ANN backend from LTM_ANN_MIN_ENTRIES up"""
+    if settings.LTM_VECTOR_BACKEND == "hnsw" and len(vectors) >= settings.LTM_ANN_MIN_ENTRIES:
+        try:
+            return HNSWIndex(vectors)
+        except ImportError:
+            print("LTM_VECTOR_BACKEND=hnsw but hnswlib is not installed; using NumPy search")
+    return NumpyIndex(vectors)
+
+
+class UserFacts:
+    """One user's retrievable LTM facts and their vector index"""
+    
+    def __init__(self, texts: List[str], vectors: List[Optional[List[float]]]):
+        self.texts = texts
+        self._indexed = [i for i, vector in enumerate(vectors) if vector]
+        # Facts saved since the last embed_ltm_facts run, newest first like texts
+        self._pending = [texts[i] for i, vector in enumerate(vectors) if not vector]
+        self.index = build_vector_index([vectors[i] for i in self._indexed]) if self._indexed else None
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def search(self, vector: Optional[List[float]], k: int) -> List[str]:
+        """
+        Top-k facts for the query vector; the first k facts without one
+        
+        Facts not embedded yet cannot be ranked, so they get up to half of the
+        slots (newest first) plus any the index leaves empty, instead of
+        vanishing from the prompt until embed_ltm_facts catches up.
+        """
+        if vector is None or self.index is None:
+            return self.texts[:k]
+        hits = [self.texts[self._indexed[i]] for i in self.index.search(vector, k)]
+        hits = hits[:k - min(len(self._pending), k // 2)]
+        return hits + self._pending[:k - len(hits)]
+
+
+class LTMIndex:
+    """
+    Per-worker LRU of UserFacts
+    
+    Entries are dropped by save_to_ltm in this worker and expire after
+    LTM_INDEX_TTL_SECONDS, so writes made by other workers show up within the TTL.
+    """
+    
+    def __init__(self, max_users: int = 1024, ttl_seconds: float = 300):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._users: OrderedDict[str, tuple[float, UserFacts]] = OrderedDict()
+    
+    def get(self, user_id: str) -> Optional[UserFacts]:
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._users.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, user_id: str, facts: UserFacts):
+        self._users[user_id] = (time.monotonic() + self.ttl_seconds, facts)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+    
+    def invalidate(self, user_id: str):
+        self._users.pop(user_id, None)
+    
+    def info(self) -> dict:
+        return {
+            "backend": settings.LTM_VECTOR_BACKEND,
+            "users": len(self._users),
+            "facts": sum(len(facts) for _, facts in self._users.values()),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+ltm_index = LTMIndex(settings.LTM_INDEX_MAX_USERS, settings.LTM_INDEX_TTL_SECONDS)
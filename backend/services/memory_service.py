@@ -1,17 +1,151 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, desc
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from backend.models.stm import ShortTermMemory
 from backend.models.ltm import LongTermMemory
 from backend.config import settings
+from backend.services.activity_service import activity_service, message_event
+from backend.services.ltm_index import ltm_index
+from backend.utils.cache import create_cache
+from backend.utils.metrics import chat_stage_duration
+from backend.utils.tokens import count_tokens
+from backend.celery_app import celery_app
+from datetime import datetime, timezone
+import asyncio
 import uuid
 
 
+# Rendered system message per user; invalidated whenever that user's LTM changes
+system_message_cache = create_cache(
+    settings.LTM_CACHE_BACKEND,
+    "ltm_system_message",
+    settings.LTM_CACHE_MAX_ENTRIES,
+    settings.LTM_CACHE_TTL_SECONDS
+)
+
+
+# LTM keys always rendered into the system message; other entries are retrieved by similarity
+PINNED_LTM_KEYS = ("user_preferences", "important_facts")
+
+# LTM key of the rolling summary of messages trimmed out of a conversation's STM
+SUMMARY_KEY_PREFIX = "conversation_summary:"
+
+
+def summary_key(conversation_id: str) -> str:
+    return f"{SUMMARY_KEY_PREFIX}{conversation_id}"
+
+
+def message_timestamp(created_at: datetime) -> str:
+    """Fixed-width UTC timestamp of an STM row, comparable as a string (naive values are UTC)"""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def group_evicted(rows) -> dict:
+    """Evicted STM rows as {(user_id, conversation_id): [{"role", "content", "created_at"}, ...]}, oldest first"""
+    grouped = {}
+    for row in sorted(rows, key=lambda row: message_timestamp(row.created_at)):
+        grouped.setdefault((row.user_id, row.conversation_id), []).append(
+            {"role": row.role, "content": row.content, "created_at": message_timestamp(row.created_at)}
+        )
+    return grouped
+
+
+# Keeps enqueue threads referenced until they finish
+_pending_enqueues = set()
+
+
+def _send_task(name: str, args: list):
+    try:
+        celery_app.send_task(name, args=args)
+    except Exception as e:
+        print(f"Could not enqueue {name}{tuple(args[:2])}: {e}")
+
+
+def _enqueue(name: str, args: list):
+    """Publish a Celery task from a thread, so the request never waits on Redis"""
+    task = asyncio.create_task(asyncio.to_thread(_send_task, name, args))
+    _pending_enqueues.add(task)
+    task.add_done_callback(_pending_enqueues.discard)
+
+
+def _enqueue_summaries(rows):
+    """Hand evicted messages to the summarization task"""
+    for (user_id, conversation_id), messages in group_evicted(rows).items():
+        _enqueue("backend.tasks.memory.summarize_stm", [user_id, conversation_id, messages])
+
+
+def enqueue_fact_embeddings(user_id: str):
+    """Have a worker embed the user's LTM facts that have no vector yet"""
+    _enqueue("backend.tasks.memory.embed_ltm_facts", [user_id])
+
+
+def is_fact_key(key: str) -> bool:
+    """LTM entries retrieved by similarity: neither pinned nor a conversation summary"""
+    return key not in PINNED_LTM_KEYS and not key.startswith(SUMMARY_KEY_PREFIX)
+
+
+def _new_stm_entry(
+    user_id: str,
+    role: str,
+    content: str,
+    conversation_id: str,
+    model_used: str = None
+) -> ShortTermMemory:
+    """Build an STM row with client-side id, timestamp and token count, so no refresh is needed"""
+    return ShortTermMemory(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        role=role,
+        content=content,
+        conversation_id=conversation_id,
+        model_used=model_used,
+        token_count=count_tokens(content),
+        created_at=datetime.now(timezone.utc)
+    )
+
+
+class ChatTurn:
+    """
+    A user message and the assistant reply, persisted together
+    
+    The user message exists only in memory until commit_turn, so the
+    prompt carries it without a write before the model call.
+    """
+    
+    def __init__(self, user_id: str, conversation_id: str, message: str):
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.user_message = _new_stm_entry(user_id, "user", message, conversation_id)
+        self.assistant_message: ShortTermMemory = None
+    
+    def reply(self, content: str, model_used: str) -> ShortTermMemory:
+        """Attach the assistant response to the turn"""
+        self.assistant_message = _new_stm_entry(
+            self.user_id, "assistant", content, self.conversation_id, model_used
+        )
+        return self.assistant_message
+    
+    @property
+    def messages(self) -> list:
+        return [m for m in (self.user_message, self.assistant_message) if m is not None]
+
+
+# Dialect-specific INSERTs supporting ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
 class MemoryService:
     """Service for managing STM and LTM"""
     
     @staticmethod
-    def add_to_stm(
-        db: Session,
+    async def add_to_stm(
+        db: AsyncSession,
         user_id: str,
         role: str,
         content: str,
@@ -20,108 +154,179 @@ class MemoryService:
     ) -> ShortTermMemory:
         """Add message to short-term memory and maintain limit"""
         # Create new STM entry
-        stm_entry = ShortTermMemory(
-            id=str(uuid.uuid4()),
-            user_id=user_id,
-            role=role,
-            content=content,
-            conversation_id=conversation_id,
-            model_used=model_used
-        )
+        stm_entry = _new_stm_entry(user_id, role, content, conversation_id, model_used)
         db.add(stm_entry)
         
-        # Clean up old entries beyond limit
-        MemoryService._cleanup_stm(db, conversation_id)
+        # Clean up old entries beyond limit (lazy mode leaves it to the periodic trim task)
+        evicted = None
+        if settings.STM_TRIM_MODE == "eager":
+            evicted = await MemoryService._cleanup_stm(db, conversation_id)
         
-        db.commit()
-        db.refresh(stm_entry)
+        await db.commit()
+        if evicted:
+            _enqueue_summaries(evicted)
         return stm_entry
     
     @staticmethod
-    def _cleanup_stm(db: Session, conversation_id: str):
-        """Remove old STM entries beyond the conversation limit"""
-        # Get count of messages in this conversation
-        message_count = db.query(ShortTermMemory).filter(
-            ShortTermMemory.conversation_id == conversation_id
-        ).count()
+    def begin_turn(user_id: str, conversation_id: str, message: str) -> ChatTurn:
+        """Start a chat turn; nothing is written until commit_turn"""
+        return ChatTurn(user_id, conversation_id, message)
+    
+    @staticmethod
+    async def commit_turn(db: AsyncSession, turn: ChatTurn):
+        """Persist the turn's messages and activity event, trim STM and commit in one transaction"""
+        model = turn.assistant_message.model_used if turn.assistant_message else ""
+        with chat_stage_duration.time(stage="stm_write", model=model):
+            db.add_all(turn.messages)
+            db.add(message_event(turn.user_id, turn.user_message.id, turn.user_message.content))
+            
+            evicted = None
+            if settings.STM_TRIM_MODE == "eager":
+                evicted = await MemoryService._cleanup_stm(db, turn.conversation_id)
+            
+            await db.commit()
+        await activity_service.invalidate(turn.user_id)
+        if evicted:
+            _enqueue_summaries(evicted)
+    
+    @staticmethod
+    async def _cleanup_stm(db: AsyncSession, conversation_id: str) -> list:
+        """
+        Remove old STM entries beyond the conversation limit
+        Returns the removed rows when they are to be summarized, else an empty list.
+        """
+        # Flush so the pending entry is ranked with the rest
+        await db.flush()
+        result = await db.execute(
+            MemoryService.stm_trim_statement(conversation_id, returning=settings.STM_SUMMARY_ENABLED),
+            execution_options={"synchronize_session": False}
+        )
+        return result.all() if settings.STM_SUMMARY_ENABLED else []
+    
+    @staticmethod
+    def stm_trim_statement(conversation_id: str = None, returning: bool = False):
+        """
+        Single DELETE keeping the newest messages of each conversation
+        
+        Ranks rows per conversation with row_number() and, once a conversation
+        has grown STM_EVICTION_BATCH exchanges past the limit (5 exchanges = 10
+        messages), deletes everything past the limit in one go. Evicting in
+        batches means one summary update per batch rather than per turn, and
+        the history at the start of the prompt stays the same between batches.
+        Without a conversation_id every conversation is trimmed, which is what
+        the lazy trim task runs. With returning=True the deleted rows come back
+        (DELETE ... RETURNING) for summarization.
+        """
+        ranked = select(
+            ShortTermMemory.id,
+            func.row_number().over(
+                partition_by=ShortTermMemory.conversation_id,
+                order_by=ShortTermMemory.created_at.desc()
+            ).label("position"),
+            func.count().over(partition_by=ShortTermMemory.conversation_id).label("total")
+        )
+        if conversation_id is not None:
+            ranked = ranked.where(ShortTermMemory.conversation_id == conversation_id)
+        ranked = ranked.subquery()
         
-        # If we exceed the limit (5 exchanges = 10 messages), remove oldest
         limit = settings.STM_CONVERSATION_LIMIT * 2
-        if message_count > limit:
-            # Get oldest messages to delete
-            to_delete = db.query(ShortTermMemory).filter(
-                ShortTermMemory.conversation_id == conversation_id
-            ).order_by(ShortTermMemory.created_at).limit(
-                message_count - limit
-            ).all()
-            
-            for entry in to_delete:
-                db.delete(entry)
+        stmt = delete(ShortTermMemory).where(
+            ShortTermMemory.id.in_(
+                select(ranked.c.id).where(
+                    ranked.c.position > limit,
+                    ranked.c.total >= limit + settings.STM_EVICTION_BATCH * 2
+                )
+            )
+        )
+        if returning:
+            stmt = stmt.returning(
+                ShortTermMemory.user_id,
+                ShortTermMemory.conversation_id,
+                ShortTermMemory.role,
+                ShortTermMemory.content,
+                ShortTermMemory.created_at
+            )
+        return stmt
     
     @staticmethod
-    def get_stm_history(
-        db: Session,
+    async def get_stm_history(
+        db: AsyncSession,
         conversation_id: str,
         limit: int = None
     ) -> list:
         """Get STM history for a conversation"""
-        query = db.query(ShortTermMemory).filter(
+        query = select(ShortTermMemory).where(
             ShortTermMemory.conversation_id == conversation_id
         ).order_by(desc(ShortTermMemory.created_at))
         
         if limit:
             query = query.limit(limit)
         
-        return query.all()
+        result = await db.execute(query)
+        return list(result.scalars().all())
     
     @staticmethod
-    def save_to_ltm(
-        db: Session,
+    async def save_to_ltm(
+        db: AsyncSession,
         user_id: str,
         key: str,
         value: dict,
         description: str = None
     ) -> LongTermMemory:
-        """Save or update LTM entry"""
-        # Check if entry exists
-        existing = db.query(LongTermMemory).filter(
-            LongTermMemory.user_id == user_id,
-            LongTermMemory.key == key
-        ).first()
+        """Save or update LTM entry (single INSERT ... ON CONFLICT upsert)"""
+        stmt = MemoryService.ltm_upsert_statement(
+            db.bind.dialect.name, user_id, key, value, description
+        ).returning(LongTermMemory)
         
-        if existing:
-            # Update existing
-            existing.value = value
-            if description:
-                existing.description = description
-            db.commit()
-            db.refresh(existing)
-            return existing
-        else:
-            # Create new
-            ltm_entry = LongTermMemory(
-                id=str(uuid.uuid4()),
-                user_id=user_id,
-                key=key,
-                value=value,
-                description=description
-            )
-            db.add(ltm_entry)
-            db.commit()
-            db.refresh(ltm_entry)
-            return ltm_entry
+        ltm_entry = await db.scalar(stmt, execution_options={"populate_existing": True})
+        await db.commit()
+        await system_message_cache.delete(user_id)
+        ltm_index.invalidate(user_id)
+        if is_fact_key(key):
+            enqueue_fact_embeddings(user_id)
+        return ltm_entry
+    
+    @staticmethod
+    def ltm_upsert_statement(
+        dialect: str,
+        user_id: str,
+        key: str,
+        value: dict,
+        description: str = None
+    ):
+        """INSERT ... ON CONFLICT (user_id, key) DO UPDATE for an LTM entry"""
+        insert = _UPSERT_INSERTS[dialect]
+        stmt = insert(LongTermMemory).values(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            key=key,
+            value=value,
+            description=description
+        )
+        
+        # Update existing entry in place; keep its description unless a new one is given.
+        # The embedding describes the old value, so it is recomputed by embed_ltm_facts.
+        update = {"value": stmt.excluded.value, "embedding": None, "updated_at": func.now()}
+        if description:
+            update["description"] = stmt.excluded.description
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "key"],
+            set_=update
+        )
     
     @staticmethod
-    def get_ltm(db: Session, user_id: str, key: str = None):
+    async def get_ltm(db: AsyncSession, user_id: str, key: str = None):
         """Get LTM entries for user"""
-        query = db.query(LongTermMemory).filter(
+        query = select(LongTermMemory).where(
             LongTermMemory.user_id == user_id
         )
         
         if key:
-            return query.filter(LongTermMemory.key == key).first()
+            result = await db.execute(query.where(LongTermMemory.key == key))
+            return result.scalars().first()
         else:
-            return query.all()
+            result = await db.execute(query)
+            return list(result.scalars().all())
 
 
 memory_service = MemoryService()
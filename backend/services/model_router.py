@@ -0,0 +1,203 @@
+"""
+Adaptive model selection for model_size="auto"
+Picks a model size from prompt heuristics, then steps away from models whose
+recent p95 latency or error rate currently breaks the SLO.
+"""
+
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from backend.config import settings
+
+
+SIZES = ("small", "medium", "large")
+
+# Prompt features that usually need a more capable model
+_COMPLEX_PATTERN = re.compile(
+    r"\b(explain|analy[sz]e|compare|design|architect|prove|derive|refactor|debug|"
+    r"step[- ]by[- ]step|trade-?offs?|optimi[sz]e|strategy|plan)\b",
+    re.IGNORECASE
+)
+
+
+def model_for_size(model_size: str) -> str:
+    """Configured model name for a size"""
+    models = {
+        "small": settings.SMALL_MODEL,
+        "medium": settings.MEDIUM_MODEL,
+        "large": settings.LARGE_MODEL
+    }
+    return models.get(model_size, settings.MEDIUM_MODEL)
+
+
+class LatencyTracker:
+    """
+    Rolling window of call latencies and outcomes for one model
+    
+    Holds the last window_size calls, and only those from the last
+    window_seconds count: a model that gets no traffic sheds its old samples,
+    so an outage it has recovered from stops counting against it.
+    """
+    
+    def __init__(self, window_size: int = 100, window_seconds: float = 300):
+        self._samples: Deque[tuple[float, float, bool]] = deque(maxlen=window_size)
+        self.window_seconds = window_seconds
+        self.total_calls = 0
+        self.total_errors = 0
+    
+    def record(self, latency_ms: float, ok: bool = True):
+        self._samples.append((time.monotonic(), latency_ms, ok))
+        self.total_calls += 1
+        if not ok:
+            self.total_errors += 1
+    
+    @property
+    def samples(self) -> List[tuple[float, bool]]:
+        """(latency_ms, ok) of the calls in the window, oldest first"""
+        cutoff = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return [(latency, ok) for _, latency, ok in self._samples]
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile (0-100) of successful calls in the window"""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(q / 100 * (len(latencies) - 1))))
+        return latencies[index]
+    
+    @property
+    def error_rate(self) -> float:
+        samples = self.samples
+        if not samples:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+    
+    def to_dict(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "total_calls": self.total_calls,
+            "total_errors": self.total_errors
+        }
+
+
+class ModelRouter:
+    """
+    Chooses a model size for model_size="auto"
+    
+    1. Heuristics on the prompt pick the preferred size: short, simple messages
+       go to small, long or complex ones (code, analysis keywords, long
+       context) to large, everything else to medium.
+    2. Once a model has ROUTER_MIN_SAMPLES calls in its window, it is only used
+       while its p95 latency is within ROUTER_LATENCY_SLO_MS and its error
+       rate within ROUTER_MAX_ERROR_RATE. Otherwise the nearest healthy size is
+       used, cheaper sizes first; if none is healthy, the fastest one.
+       Samples expire after ROUTER_WINDOW_SECONDS, so a model routed away from
+       is tried again once its bad samples have aged out.
+    
+    Latencies are recorded for every call (not only "auto" ones) so the
+    router's view stays current whatever clients ask for.
+    """
+    
+    def __init__(self):
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.decisions: Dict[str, int] = {size: 0 for size in SIZES}
+        self.fallbacks = 0
+    
+    def tracker(self, model: str) -> LatencyTracker:
+        if model not in self.trackers:
+            self.trackers[model] = LatencyTracker(settings.ROUTER_WINDOW_SIZE, settings.ROUTER_WINDOW_SECONDS)
+        return self.trackers[model]
+    
+    def record(self, model: str, latency_ms: float, ok: bool = True):
+        self.tracker(model).record(latency_ms, ok)
+    
+    def preferred_size(self, message: str, context: List[Dict]) -> str:
+        """Size suggested by the prompt alone"""
+        context_chars = sum(len(m["content"]) for m in context)
+        score = 0
+        
+        if len(message) >= settings.ROUTER_LARGE_MIN_CHARS:
+            score += 2
+        elif len(message) > settings.ROUTER_SMALL_MAX_CHARS:
+            score += 1
+        if "```" in message:
+            score += 2
+        score += min(2, len(_COMPLEX_PATTERN.findall(message)))
+        if message.count("?") > 1:
+            score += 1
+        if context_chars >= settings.ROUTER_LARGE_MIN_CHARS * 4:
+            score += 1
+        
+        if score == 0:
+            return "small"
+        if score >= 3:
+            return "large"
+        return "medium"
+    
+    def healthy(self, model: str) -> bool:
+        """Whether a model currently meets the latency SLO and error budget"""
+        tracker = self.trackers.get(model)
+        if tracker is None or len(tracker.samples) < settings.ROUTER_MIN_SAMPLES:
+            return True  # Not enough data to judge
+        if tracker.error_rate > settings.ROUTER_MAX_ERROR_RATE:
+            return False
+        p95 = tracker.percentile(95)
+        return p95 is None or p95 <= settings.ROUTER_LATENCY_SLO_MS
+    
+    def choose(self, message: str, context: List[Dict], candidates: Optional[List[str]] = None) -> str:
+        """
+        Pick a model size for this prompt
+        
+        Args:
+            message: The new user message
+            context: System message and STM history that will be sent with it
+            candidates: Sizes that can be served (e.g. provider configured);
+                defaults to all sizes
+        """
+        candidates = [size for size in SIZES if candidates is None or size in candidates] or list(SIZES)
+        preferred = self.preferred_size(message, context)
+        if preferred not in candidates:
+            preferred = min(candidates, key=lambda size: abs(SIZES.index(size) - SIZES.index(preferred)))
+        
+        # Preferred first, then by distance from it, cheaper before larger
+        order = sorted(
+            candidates,
+            key=lambda size: (abs(SIZES.index(size) - SIZES.index(preferred)), SIZES.index(size))
+        )
+        chosen = next((size for size in order if self.healthy(model_for_size(size))), None)
+        if chosen is None:
+            chosen = min(order, key=self._p95_or_inf)
+        
+        if chosen != preferred:
+            self.fallbacks += 1
+        self.decisions[chosen] += 1
+        return chosen
+    
+    def _p95_or_inf(self, size: str) -> float:
+        tracker = self.trackers.get(model_for_size(size))
+        p95 = tracker.percentile(95) if tracker else None
+        return p95 if p95 is not None else float("inf")
+    
+    def info(self) -> dict:
+        return {
+            "slo_p95_ms": settings.ROUTER_LATENCY_SLO_MS,
+            "max_error_rate": settings.ROUTER_MAX_ERROR_RATE,
+            "auto_decisions": self.decisions,
+            "auto_fallbacks": self.fallbacks,
+            "models": {
+                size: {
+                    "model": model_for_size(size),
+                    "healthy": self.healthy(model_for_size(size)),
+                    **self.tracker(model_for_size(size)).to_dict()
+                }
+                for size in SIZES
+            }
+        }
+
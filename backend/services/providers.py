@@ -0,0 +1,483 @@
+"""
+Model providers
+Each provider owns its SDK client and httpx connection pool; the registry
+maps configured model names to the provider that serves them.
+"""
+
+from typing import List, Dict, Optional, AsyncIterator
+import asyncio
+import math
+import httpx
+import anthropic
+import openai
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+from backend.config import settings
+
+
+class ProviderError(Exception):
+    """
+    A failed provider call
+    
+    retryable: a transient failure worth another attempt on the same provider
+    fails_over: another provider may well succeed where this one failed
+    """
+    
+    status_code = 502
+    retryable = False
+    fails_over = True
+    
+    def __init__(self, provider: str, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.provider = provider
+        self.detail = detail
+        self.retry_after = retry_after
+    
+    @property
+    def headers(self) -> dict:
+        if self.retry_after is None:
+            return {}
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class ProviderNotConfigured(ProviderError):
+    """No API key (or client) for the provider"""
+    
+    status_code = 503
+
+
+class ProviderUnavailable(ProviderError):
+    """Connection failure or 5xx from the provider"""
+    
+    retryable = True
+
+
+class ProviderTimeout(ProviderUnavailable):
+    """The provider did not answer within the model's timeout"""
+    
+    status_code = 504
+
+
+class ProviderRateLimited(ProviderUnavailable):
+    """The provider returned 429"""
+    
+    status_code = 503
+
+
+class ProviderRequestError(ProviderError):
+    """The provider rejected the request itself (e.g. too long); another one would too"""
+    
+    fails_over = False
+
+
+class CircuitOpen(ProviderError):
+    """The provider's circuit breaker is open after repeated failures"""
+    
+    status_code = 503
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def provider_error(provider: str, e: Exception) -> ProviderError:
+    """Map an SDK or transport exception onto a ProviderError"""
+    if isinstance(e, ProviderError):
+        return e
+    
+    detail = f"Error getting {provider} response: {e}"
+    if isinstance(e, (openai.APITimeoutError, anthropic.APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError)):
+        return ProviderTimeout(provider, detail)
+    if isinstance(e, (openai.APIConnectionError, anthropic.APIConnectionError, httpx.TransportError)):
+        return ProviderUnavailable(provider, detail)
+    
+    status = getattr(e, "status_code", None)
+    if status == 429:
+        return ProviderRateLimited(provider, detail, _retry_after(e))
+    if status == 408:
+        return ProviderTimeout(provider, detail)
+    if status is not None and status >= 500:
+        return ProviderUnavailable(provider, detail)
+    if status in (400, 404, 413, 422):
+        return ProviderRequestError(provider, detail)
+    return ProviderError(provider, detail)
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """Connection pool for one provider"""
+    return httpx.AsyncClient(
+        http2=settings.PROVIDER_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PROVIDER_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            settings.LARGE_MODEL_TIMEOUT,
+            connect=settings.PROVIDER_CONNECT_TIMEOUT
+        )
+    )
+
+
+# Message key marking the end of a prompt prefix that stays the same across turns
+CACHE_BREAKPOINT = "cache_breakpoint"
+
+
+class PromptCacheStats:
+    """Input tokens per provider and model, and how many the provider served from its prompt cache"""
+    
+    def __init__(self):
+        # (provider, model) -> [input tokens, cached tokens, cache write tokens, calls]
+        self._totals: Dict[tuple, list] = {}
+    
+    def record(self, provider: str, model: str, input_tokens: int, cached_tokens: int = 0, cache_write_tokens: int = 0):
+        """
+        Args:
+            input_tokens: All prompt tokens of the call, cached ones included
+            cached_tokens: Prompt tokens read from the provider's cache
+            cache_write_tokens: Prompt tokens written to the cache (Anthropic bills these extra)
+        """
+        totals = self._totals.setdefault((provider, model), [0, 0, 0, 0])
+        totals[0] += input_tokens
+        totals[1] += cached_tokens
+        totals[2] += cache_write_tokens
+        totals[3] += 1
+    
+    def samples(self) -> List[tuple]:
+        """((provider, model), input tokens, cached tokens) per model"""
+        return [(key, totals[0], totals[1]) for key, totals in self._totals.items()]
+    
+    def info(self) -> dict:
+        return {
+            f"{provider}:{model}": {
+                "calls": calls,
+                "input_tokens": input_tokens,
+                "cached_tokens": cached_tokens,
+                "cache_write_tokens": cache_write_tokens,
+                "hit_ratio": round(cached_tokens / input_tokens, 3) if input_tokens else None
+            }
+            for (provider, model), (input_tokens, cached_tokens, cache_write_tokens, calls) in self._totals.items()
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def strip_cache_breakpoints(messages: List[Dict]) -> List[Dict]:
+    """Messages without the CACHE_BREAKPOINT key, for APIs that take role/content only"""
+    return [{k: v for k, v in msg.items() if k != CACHE_BREAKPOINT} for msg in messages]
+
+
+def to_anthropic_messages(messages: List[Dict]) -> tuple[List[Dict], List[Dict]]:
+    """
+    System blocks and turns for the Anthropic Messages API
+    
+    Leading system messages become the `system` parameter; a system note later
+    in the list (per-message LTM facts) is sent as the first text block of the
+    following turn, so it sits after the cached prefix instead of breaking it.
+    Messages marked with CACHE_BREAKPOINT get cache_control on their last block.
+    """
+    cache = settings.PROMPT_CACHE_ENABLED
+    
+    def block(text: str, marked: bool) -> Dict:
+        item = {"type": "text", "text": text}
+        if marked and cache:
+            item["cache_control"] = {"type": "ephemeral"}
+        return item
+    
+    system = []
+    turns = []
+    notes = []
+    for msg in messages:
+        marked = bool(msg.get(CACHE_BREAKPOINT))
+        if msg["role"] == "system":
+            if turns:
+                notes.append(msg["content"])
+            else:
+                system.append(block(msg["content"], marked))
+            continue
+        blocks = [block(note, False) for note in notes] + [block(msg["content"], marked)]
+        notes = []
+        if len(blocks) == 1 and "cache_control" not in blocks[0]:
+            turns.append({"role": msg["role"], "content": msg["content"]})
+        else:
+            turns.append({"role": msg["role"], "content": blocks})
+    return system, turns
+
+
+class Provider:
+    """
+    Base class for a model provider
+    
+    Subclasses implement complete() and stream(); clients are created lazily
+    (or in start()) and released in close(). Failures are raised as
+    ProviderError, never returned as text; retries and failover are up to
+    the caller (see backend.services.resilience).
+    """
+    
+    name = "base"
+    
+    @property
+    def available(self) -> bool:
+        """Whether the provider is configured (e.g. has an API key)"""
+        return True
+    
+    async def start(self):
+        """Create clients and pre-open connections"""
+    
+    async def close(self):
+        """Release clients and connection pools"""
+    
+    async def complete(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> str:
+        raise NotImplementedError
+    
+    async def stream(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+    
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Embedding vector for text, if the provider offers embeddings"""
+        vectors = await self.embed_many([text])
+        return vectors[0] if vectors else None
+    
+    async def embed_many(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embedding vectors for several texts in one request"""
+        return None
+
+
+class _HTTPProvider(Provider):
+    """Shared lifecycle for SDK clients built on our own httpx pool"""
+    
+    def __init__(self):
+        self.client = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    def _create_client(self, http_client: httpx.AsyncClient):
+        raise NotImplementedError
+    
+    def _ensure_client(self):
+        if self.client is None and self.available:
+            self._http_client = build_http_client()
+            self.client = self._create_client(self._http_client)
+        return self.client
+    
+    def _require_client(self):
+        client = self._ensure_client()
+        if client is None:
+            raise ProviderNotConfigured(self.name, f"{self.name} API key not configured")
+        return client
+    
+    async def start(self):
+        if self._ensure_client() is None or not settings.PROVIDER_WARMUP:
+            return
+        # Pay DNS + TCP + TLS now rather than on the first chat request;
+        # the response status is irrelevant, failures are ignored.
+        url = str(self.client.base_url)
+        try:
+            await self._http_client.head(url, timeout=settings.PROVIDER_CONNECT_TIMEOUT)
+        except Exception as e:
+            print(f"Provider warm-up failed for {url}: {e}")
+    
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self.client = None
+        self._http_client = None
+
+
+class OpenAIProvider(_HTTPProvider):
+    name = "openai"
+    
+    @property
+    def available(self) -> bool:
+        return bool(settings.OPENAI_API_KEY)
+    
+    def _create_client(self, http_client: httpx.AsyncClient):
+        # Retries are ours (with jitter, breakers and failover), not the SDK's
+        return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client, max_retries=0)
+    
+    async def complete(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> str:
+        """Get response from OpenAI"""
+        client = self._require_client()
+        
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=strip_cache_breakpoints(messages),
+                timeout=timeout
+            )
+        except Exception as e:
+            raise provider_error(self.name, e) from e
+        self._record_usage(model, response.usage)
+        return response.choices[0].message.content or ""
+    
+    async def stream(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> AsyncIterator[str]:
+        """Stream response deltas from OpenAI"""
+        client = self._require_client()
+        
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=strip_cache_breakpoints(messages),
+                stream=True,
+                # Usage (cached prompt tokens included) arrives in a final chunk without choices
+                stream_options={"include_usage": True},
+                timeout=timeout
+            )
+            # Closing releases the connection at once if the consumer stops early (e.g. cancel)
+            async with stream:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        self._record_usage(model, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise provider_error(self.name, e) from e
+    
+    def _record_usage(self, model: str, usage):
+        # OpenAI caches prompt prefixes of 1024+ tokens by itself; prompt_tokens includes the cached ones
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        cached = (details.cached_tokens or 0) if details is not None else 0
+        prompt_cache_stats.record(self.name, model, usage.prompt_tokens, cached)
+    
+    async def embed_many(self, texts: List[str]) -> Optional[List[List[float]]]:
+        if not self._ensure_client():
+            return None
+        
+        try:
+            response = await self.client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=texts,
+                timeout=httpx.Timeout(settings.SMALL_MODEL_TIMEOUT, connect=settings.PROVIDER_CONNECT_TIMEOUT)
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            return None
+
+
+class AnthropicProvider(_HTTPProvider):
+    name = "anthropic"
+    
+    @property
+    def available(self) -> bool:
+        return bool(settings.ANTHROPIC_API_KEY)
+    
+    def _create_client(self, http_client: httpx.AsyncClient):
+        return AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, http_client=http_client, max_retries=0)
+    
+    async def complete(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> str:
+        """Get response from Anthropic"""
+        client = self._require_client()
+        system, turns = to_anthropic_messages(messages)
+        
+        try:
+            response = await client.messages.create(
+                model=model,
+                max_tokens=1024,
+                system=system or anthropic.NOT_GIVEN,
+                messages=turns,
+                timeout=timeout
+            )
+        except Exception as e:
+            raise provider_error(self.name, e) from e
+        self._record_usage(model, response.usage)
+        return response.content[0].text
+    
+    async def stream(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> AsyncIterator[str]:
+        """Stream response deltas from Anthropic"""
+        client = self._require_client()
+        system, turns = to_anthropic_messages(messages)
+        
+        try:
+            async with client.messages.stream(
+                model=model,
+                max_tokens=1024,
+                system=system or anthropic.NOT_GIVEN,
+                messages=turns,
+                timeout=timeout
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+        except Exception as e:
+            raise provider_error(self.name, e) from e
+        self._record_usage(model, message.usage)
+    
+    def _record_usage(self, model: str, usage):
+        # input_tokens excludes the tokens read from or written to the cache
+        cached = usage.cache_read_input_tokens or 0
+        written = usage.cache_creation_input_tokens or 0
+        prompt_cache_stats.record(self.name, model, usage.input_tokens + cached + written, cached, written)
+
+
+class ProviderRegistry:
+    """Providers by name, and which provider serves (or stands in for) each configured model"""
+    
+    def __init__(self):
+        self._providers: Dict[str, Provider] = {}
+    
+    def register(self, provider: Provider):
+        """Add or replace a provider (e.g. a stub in benchmarks)"""
+        self._providers[provider.name] = provider
+    
+    def get(self, name: str) -> Optional[Provider]:
+        return self._providers.get(name)
+    
+    @property
+    def model_providers(self) -> Dict[str, str]:
+        """Model name -> provider name, from settings"""
+        return {
+            settings.SMALL_MODEL: settings.SMALL_MODEL_PROVIDER,
+            settings.MEDIUM_MODEL: settings.MEDIUM_MODEL_PROVIDER,
+            settings.LARGE_MODEL: settings.LARGE_MODEL_PROVIDER
+        }
+    
+    def for_model(self, model: str) -> Provider:
+        """Provider serving a model"""
+        name = self.model_providers.get(model, settings.MEDIUM_MODEL_PROVIDER)
+        provider = self._providers.get(name)
+        if provider is None:
+            raise ValueError(f"No provider registered as '{name}' for model '{model}'")
+        return provider
+    
+    def fallback_for(self, model: str) -> Optional[tuple[Provider, str]]:
+        """Alternate (provider, model) for a configured model, if one is set up and available"""
+        fallback = {
+            settings.SMALL_MODEL: settings.SMALL_MODEL_FALLBACK,
+            settings.MEDIUM_MODEL: settings.MEDIUM_MODEL_FALLBACK,
+            settings.LARGE_MODEL: settings.LARGE_MODEL_FALLBACK
+        }.get(model)
+        if not fallback:
+            return None
+        
+        name, _, fallback_model = fallback.partition(":")
+        provider = self._providers.get(name)
+        if provider is None or not provider.available or not fallback_model:
+            return None
+        return provider, fallback_model
+    
+    def serves(self, model: str) -> bool:
+        """Whether a configured provider is registered for the model"""
+        provider = self._providers.get(self.model_providers.get(model, settings.MEDIUM_MODEL_PROVIDER))
+        return provider is not None and provider.available
+    
+    async def start(self):
+        await asyncio.gather(*(provider.start() for provider in self._providers.values()))
+    
+    async def close(self):
+        for provider in self._providers.values():
+            await provider.close()
+
+
+def default_registry() -> ProviderRegistry:
+    registry = ProviderRegistry()
+    registry.register(OpenAIProvider())
+    registry.register(AnthropicProvider())
+    return registry
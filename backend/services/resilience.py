@@ -0,0 +1,245 @@
+"""
+Resilient provider calls
+Jittered retries on transient failures, a circuit breaker per provider, and
+failover (or, past HEDGE_AFTER_MS, a hedged request) to the model's fallback
+on another provider, so one degraded provider cannot stall every request.
+"""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from backend.config import settings
+from backend.services.providers import Provider, ProviderRegistry, ProviderError, CircuitOpen
+
+
+T = TypeVar("T")
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Seconds to wait before retry number `attempt` (0-based): full jitter, at least Retry-After"""
+    cap = min(settings.PROVIDER_RETRY_MAX_DELAY, settings.PROVIDER_RETRY_BASE_DELAY * 2 ** attempt)
+    delay = random.uniform(0, cap)
+    if retry_after:
+        delay = max(delay, min(retry_after, settings.PROVIDER_RETRY_MAX_DELAY))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a provider is down
+    
+    Opens after BREAKER_FAILURE_THRESHOLD consecutive transient failures; once
+    BREAKER_RESET_SECONDS have passed a single trial call is let through
+    (half-open), which closes the circuit on success or reopens it on failure.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial = False
+    
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open":
+            if self._trial:
+                return False
+            self._trial = True
+        return True
+    
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+    
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+    
+    def failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """A call that says nothing about provider health (cancelled, rejected request)"""
+        self._trial = False
+    
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "retry_after_s": round(self.retry_after, 1) if self.state == "open" else None
+        }
+
+
+class ResilientCaller:
+    """
+    Runs one logical model call against its provider, retrying and failing over
+    
+    call() takes an `attempt(provider, model)` coroutine factory, so the same
+    policy covers completions and opening a stream (up to its first delta; a
+    stream that fails midway cannot be retried without repeating output).
+    
+    1. Each target (the model's provider, then its fallback) is tried up to
+       1 + PROVIDER_MAX_RETRIES times while the error is transient, sleeping
+       backoff_delay() in between; an open circuit skips the target at once.
+    2. If the primary fails with an error another provider could avoid, the
+       fallback from *_MODEL_FALLBACK is tried.
+    3. With HEDGE_AFTER_MS set, the fallback is also started when the primary
+       has not answered by then; the first success wins and the other call is
+       cancelled (its result, if it finished anyway, goes to `discard`).
+    
+    Admission is up to `attempt`: AIService takes a separate, non-waiting slot
+    for calls to the fallback, and a fallback attempt that raises anything other
+    than ProviderError (no free slot) leaves the primary to finish on its own.
+    """
+    
+    def __init__(self, registry: ProviderRegistry, record: Callable[[str, float, bool], None]):
+        self.registry = registry
+        self.record = record
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+    
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(
+                settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS
+            )
+        return self.breakers[provider]
+    
+    async def call(
+        self,
+        model: str,
+        attempt: Callable[[Provider, str], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+        record_success: bool = True
+    ) -> tuple[T, str]:
+        """
+        Returns: (attempt result, model that produced it)
+        Raises: the primary's error when no target succeeded (a fallback that
+        failed, or had no admission slot, never replaces it)
+        
+        record_success=False leaves timing successful calls to the caller
+        (streams record their full duration once they end).
+        """
+        primary = (self.registry.for_model(model), model)
+        fallback = self.registry.fallback_for(model)
+        hedge_after = settings.HEDGE_AFTER_MS / 1000 if fallback and settings.HEDGE_AFTER_MS > 0 else None
+        
+        tasks = {asyncio.create_task(self._with_retries(*primary, attempt, record_success)): primary}
+        pending = set(tasks)
+        winner = None
+        error = None
+        hedged = False
+        try:
+            while pending:
+                single = len(tasks) == 1
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=hedge_after if single else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if hedged and tasks[task] is fallback:
+                            self.hedge_wins += 1
+                        return task.result(), tasks[task][1]
+                    if tasks[task] is primary:
+                        error = task.exception()
+                
+                if single and fallback and (not done or getattr(error, "fails_over", False)):
+                    if done:
+                        self.failovers += 1
+                    else:
+                        self.hedges += 1
+                        hedged = True
+                    task = asyncio.create_task(self._with_retries(*fallback, attempt, record_success))
+                    tasks[task] = fallback
+                    pending.add(task)
+            raise error
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    _abandon(task, discard)
+    
+    async def _with_retries(
+        self,
+        provider: Provider,
+        model: str,
+        attempt: Callable[[Provider, str], Awaitable[T]],
+        record_success: bool
+    ) -> T:
+        breaker = self.breaker(provider.name)
+        for retry in range(settings.PROVIDER_MAX_RETRIES + 1):
+            if not breaker.allow():
+                raise CircuitOpen(
+                    provider.name,
+                    f"{provider.name} is failing, calls are paused",
+                    breaker.retry_after
+                )
+            
+            started = time.perf_counter()
+            try:
+                result = await attempt(provider, model)
+            except ProviderError as e:
+                self.record(model, (time.perf_counter() - started) * 1000, False)
+                if e.retryable:
+                    breaker.failure()
+                else:
+                    breaker.release()
+                if not e.retryable or retry == settings.PROVIDER_MAX_RETRIES:
+                    raise
+                retry_after = e.retry_after
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.success()
+                if record_success:
+                    self.record(model, (time.perf_counter() - started) * 1000, True)
+                return result
+            
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(retry, retry_after))
+    
+    def info(self) -> dict:
+        return {
+            "max_retries": settings.PROVIDER_MAX_RETRIES,
+            "hedge_after_ms": settings.HEDGE_AFTER_MS,
+            "retries": self.retries,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "breakers": {name: breaker.to_dict() for name, breaker in self.breakers.items()}
+        }
+
+
+def _abandon(task: asyncio.Task, discard: Optional[Callable[[T], Awaitable[None]]]):
+    """Cancel a losing attempt; release its result if it completes anyway"""
+    def finished(task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is None and discard is not None:
+            asyncio.ensure_future(discard(task.result()))
+    
+    task.add_done_callback(finished)
+    task.cancel()
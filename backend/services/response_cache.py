@@ -0,0 +1,139 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+
+
+Embedder = Callable[[str], Awaitable[Optional[List[float]]]]
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return " ".join(text.split()).casefold()
+
+
+def _digest(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Opt-in cache of model responses
+    
+    Exact tier: normalized hash of (model, system message, context, message),
+    stored in any backend from backend.utils.cache (TTL and size eviction).
+    Semantic tier (optional): when there is no exact hit, a response cached for
+    the same model and context is reused if the new message's embedding is
+    close enough to the cached message's.
+    """
+    
+    def __init__(
+        self,
+        store,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95,
+        max_semantic_entries: int = 1000,
+        ttl_seconds: float = 3600
+    ):
+        self.store = store
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_semantic_entries = max_semantic_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_hits = 0
+        # exact key -> (expires_at, context key, unit-length embedding)
+        self._vectors: OrderedDict[str, tuple[float, str, np.ndarray]] = OrderedDict()
+        # Recent embeddings, so a miss followed by set() embeds the message once
+        self._recent_embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+    
+    @staticmethod
+    def _keys(model: str, messages: List[Dict]) -> tuple[str, str]:
+        """(exact key, context key); the context key leaves out the final message"""
+        normalized = [[m["role"], _normalize(m["content"])] for m in messages]
+        return _digest([model, normalized]), _digest([model, normalized[:-1]])
+    
+    async def get(self, model: str, messages: List[Dict]) -> Optional[str]:
+        """Cached response for this prompt, if any"""
+        exact_key, context_key = self._keys(model, messages)
+        
+        response = await self.store.get(exact_key)
+        if response is not None or self.embedder is None:
+            return response
+        
+        vector = await self._embed(messages[-1]["content"])
+        if vector is None:
+            return None
+        
+        match = self._nearest(context_key, vector)
+        if match is None:
+            return None
+        
+        response = await self.store.get(match)
+        if response is not None:
+            self.semantic_hits += 1
+        return response
+    
+    async def set(self, model: str, messages: List[Dict], response: str):
+        """Cache a response for this prompt"""
+        exact_key, context_key = self._keys(model, messages)
+        await self.store.set(exact_key, response)
+        
+        if self.embedder is None:
+            return
+        vector = await self._embed(messages[-1]["content"])
+        if vector is None:
+            return
+        
+        self._vectors[exact_key] = (time.monotonic() + self.ttl_seconds, context_key, vector)
+        self._vectors.move_to_end(exact_key)
+        while len(self._vectors) > self.max_semantic_entries:
+            self._vectors.popitem(last=False)
+    
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        text = _normalize(text)
+        if text in self._recent_embeddings:
+            return self._recent_embeddings[text]
+        
+        embedding = await self.embedder(text)
+        if not embedding:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        
+        self._recent_embeddings[text] = vector / norm
+        while len(self._recent_embeddings) > 256:
+            self._recent_embeddings.popitem(last=False)
+        return self._recent_embeddings[text]
+    
+    def _nearest(self, context_key: str, vector: np.ndarray) -> Optional[str]:
+        """Most similar cached message with the same model and context"""
+        now = time.monotonic()
+        keys, vectors = [], []
+        for key, (expires_at, entry_context, entry_vector) in list(self._vectors.items()):
+            if expires_at < now:
+                del self._vectors[key]
+            elif entry_context == context_key:
+                keys.append(key)
+                vectors.append(entry_vector)
+        
+        if not keys:
+            return None
+        
+        similarities = np.stack(vectors) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return keys[best]
+    
+    def info(self) -> dict:
+        return {
+            **self.store.info(),
+            "semantic": self.embedder is not None,
+            "semantic_entries": len(self._vectors),
+            "semantic_hits": self.semantic_hits,
+            "similarity_threshold": self.similarity_threshold
+        }
@@ -1,9 +1,18 @@
+from sqlalchemy import tuple_, select, insert, update, delete
 from sqlalchemy.orm import Session
 from backend.models.task import Task
-from backend.schemas.task import TaskCreate, TaskUpdate
+from backend.services.activity_service import task_completed_event
+from backend.schemas.task import TaskCreate, TaskUpdate, TaskOperation
+from backend.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime, timezone
+from typing import Optional
 import uuid
 
 
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 class TaskService:
     """Service for task management operations"""
     
@@ -18,14 +27,53 @@ class TaskService:
             completed=task_data.completed
         )
         db.add(task)
+        if task.completed:
+            db.add(task_completed_event(user_id, task.id, task.title))
         db.commit()
         db.refresh(task)
         return task
     
     @staticmethod
-    def get_tasks(db: Session, user_id: str = "default_user") -> list[Task]:
-        """Get all tasks for a user"""
-        return db.query(Task).filter(Task.user_id == user_id).all()
+    def get_tasks(
+        db: Session,
+        user_id: str = "default_user",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        completed: Optional[bool] = None,
+        search: Optional[str] = None,
+        order: str = "asc"
+    ) -> tuple[list[Task], Optional[str]]:
+        """
+        Get one page of a user's tasks, ordered by (created_at, id)
+        
+        Keyset pagination: the cursor carries the sort key of the last task
+        returned, so every page is an index range scan on
+        (user_id, [completed,] created_at, id) however deep it is.
+        
+        Returns:
+            The tasks, and the cursor for the next page (None on the last page)
+        """
+        query = db.query(Task).filter(Task.user_id == user_id)
+        if completed is not None:
+            query = query.filter(Task.completed == completed)
+        if search:
+            query = query.filter(Task.title.ilike(f"%{_escape_like(search)}%", escape="\\"))
+        
+        key = tuple_(Task.created_at, Task.id)
+        if cursor is not None:
+            after = tuple_(*decode_cursor(cursor))
+            query = query.filter(key < after if order == "desc" else key > after)
+        if order == "desc":
+            query = query.order_by(Task.created_at.desc(), Task.id.desc())
+        else:
+            query = query.order_by(Task.created_at, Task.id)
+        
+        # One extra row tells whether there is a next page
+        tasks = query.limit(limit + 1).all()
+        if len(tasks) <= limit:
+            return tasks, None
+        tasks = tasks[:limit]
+        return tasks, encode_cursor(tasks[-1].created_at, tasks[-1].id)
     
     @staticmethod
     def get_task(db: Session, task_id: str, user_id: str = "default_user") -> Task:
@@ -47,9 +95,12 @@ class TaskService:
         if not task:
             return None
         
+        was_completed = task.completed
         update_data = task_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(task, field, value)
+        if task.completed and not was_completed:
+            db.add(task_completed_event(user_id, task.id, task.title))
         
         db.commit()
         db.refresh(task)
@@ -65,6 +116,84 @@ class TaskService:
         db.delete(task)
         db.commit()
         return True
+    
+    
+    @staticmethod
+    def apply_batch(db: Session, operations: list[TaskOperation], user_id: str = "default_user") -> list[dict]:
+        """
+        Apply creates, updates and deletes in one transaction
+        
+        Operations take effect in request order (an update after a delete of
+        the same task is not_found), but reach the database as one SELECT of
+        the referenced tasks and at most one bulk INSERT, UPDATE and DELETE
+        (plus one INSERT of activity events for tasks that became completed).
+        Unknown ids are reported per operation; a database error rolls the
+        whole batch back.
+        
+        Returns:
+            One result per operation: op, id, status and (created/updated) task
+        """
+        table = Task.__table__
+        referenced = {operation.id for operation in operations if operation.op != "create"}
+        # id -> column values as they stand after the operations so far
+        rows = {}
+        if referenced:
+            result = db.execute(
+                select(table).where(Task.user_id == user_id, Task.id.in_(referenced))
+            )
+            rows = {row["id"]: dict(row) for row in result.mappings()}
+        
+        created, updated, deleted, events = [], {}, set(), []
+        results = []
+        for operation in operations:
+            if operation.op == "create":
+                row = {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "title": operation.title,
+                    "description": operation.description,
+                    "completed": operation.completed,
+                    "created_at": datetime.now(timezone.utc),
+                    "updated_at": None
+                }
+                created.append(row)
+                if row["completed"]:
+                    events.append(task_completed_event(user_id, row["id"], row["title"]))
+                results.append({"op": "create", "id": row["id"], "status": "created", "task": Task(**row).to_dict()})
+                continue
+            
+            row = rows.get(operation.id)
+            if row is None:
+                results.append({"op": operation.op, "id": operation.id, "status": "not_found", "task": None})
+            elif operation.op == "update":
+                changes = operation.model_dump(exclude_unset=True, exclude={"op", "id"})
+                changes["updated_at"] = datetime.now(timezone.utc)
+                was_completed = row["completed"]
+                row.update(changes)
+                if row["completed"] and not was_completed:
+                    events.append(task_completed_event(user_id, row["id"], row["title"]))
+                updated.setdefault(operation.id, {"id": operation.id}).update(changes)
+                results.append({"op": "update", "id": operation.id, "status": "updated", "task": Task(**row).to_dict()})
+            else:
+                del rows[operation.id]
+                updated.pop(operation.id, None)
+                deleted.add(operation.id)
+                results.append({"op": "delete", "id": operation.id, "status": "deleted", "task": None})
+        
+        try:
+            if created:
+                db.execute(insert(Task), created)
+            if updated:
+                # ORM bulk UPDATE by primary key: one executemany per set of changed columns
+                db.execute(update(Task), list(updated.values()))
+            if deleted:
+                db.execute(delete(Task).where(Task.user_id == user_id, Task.id.in_(deleted)))
+            db.add_all(events)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return results
 
 
 task_service = TaskService()
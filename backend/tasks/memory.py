@@ -0,0 +1,196 @@
+import asyncio
+import httpx
+import redis
+from sqlalchemy import select, update
+from backend.celery_app import celery_app
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models.ltm import LongTermMemory
+from backend.services.ltm_index import fact_text
+from backend.services.memory_service import MemoryService, group_evicted, summary_key, PINNED_LTM_KEYS, SUMMARY_KEY_PREFIX
+from backend.services.providers import default_registry, ProviderError
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Merge the new messages into the existing summary. Keep facts, decisions, names, "
+    "preferences and open questions; drop greetings and filler. "
+    "Reply with the updated summary only, in at most {max_words} words."
+)
+
+
+@celery_app.task(name="backend.tasks.memory.trim_stm")
+def trim_stm() -> int:
+    """
+    Trim every conversation back to the STM limit in one statement
+    Scheduled by celery beat when STM_TRIM_MODE is "lazy"
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            MemoryService.stm_trim_statement(returning=settings.STM_SUMMARY_ENABLED),
+            execution_options={"synchronize_session": False}
+        )
+        evicted = result.all() if settings.STM_SUMMARY_ENABLED else []
+        db.commit()
+    finally:
+        db.close()
+    
+    for (user_id, conversation_id), messages in group_evicted(evicted).items():
+        summarize_stm.delay(user_id, conversation_id, messages)
+    return len(evicted) if settings.STM_SUMMARY_ENABLED else result.rowcount
+
+
+@celery_app.task(
+    name="backend.tasks.memory.summarize_stm",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=30
+)
+def summarize_stm(self, user_id: str, conversation_id: str, messages: list):
+    """
+    Fold messages trimmed from STM into the conversation's running summary
+    
+    The summary is stored in LTM under conversation_summary:<conversation_id>
+    and injected into the prompt by AIService._build_context. A per-conversation
+    lock keeps concurrent evictions from overwriting each other's summary, and
+    the summary records the newest message it covers: messages at or before
+    that point are skipped, so a batch delivered late is never folded in after
+    newer ones.
+    """
+    key = summary_key(conversation_id)
+    lock = redis.Redis.from_url(settings.REDIS_URL).lock(
+        f"lock:{key}", timeout=settings.SMALL_MODEL_TIMEOUT * 2, blocking_timeout=settings.SMALL_MODEL_TIMEOUT
+    )
+    if not lock.acquire():
+        raise self.retry()
+    
+    db = SessionLocal()
+    try:
+        entry = db.scalar(
+            select(LongTermMemory).where(
+                LongTermMemory.user_id == user_id,
+                LongTermMemory.key == key
+            )
+        )
+        previous = entry.value if entry else {}
+        
+        summarized_through = previous.get("summarized_through")
+        if summarized_through:
+            # Messages queued before timestamps were sent along are always folded in
+            fresh = [m for m in messages if m.get("created_at") is None or m["created_at"] > summarized_through]
+            if len(fresh) < len(messages):
+                print(f"STM summary for {conversation_id}: skipping {len(messages) - len(fresh)} messages older than the summary")
+            messages = fresh
+        if not messages:
+            return 0
+        
+        summary = asyncio.run(_summarize(previous.get("summary", ""), messages))
+        if summary is None:
+            raise self.retry()
+        
+        db.execute(MemoryService.ltm_upsert_statement(
+            db.bind.dialect.name,
+            user_id,
+            key,
+            {
+                "summary": summary,
+                "messages": previous.get("messages", 0) + len(messages),
+                "summarized_through": messages[-1].get("created_at", summarized_through)
+            },
+            "Rolling summary of messages trimmed from short-term memory"
+        ))
+        db.commit()
+        return len(messages)
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            pass  # Expired while the model was answering
+
+
+async def _summarize(previous: str, messages: list) -> str:
+    """Updated summary from the model, or None if the call failed"""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_words=settings.STM_SUMMARY_MAX_WORDS)},
+        {"role": "user", "content": f"Existing summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"}
+    ]
+    model = settings.STM_SUMMARY_MODEL or settings.SMALL_MODEL
+    
+    # Fresh clients per run: each task gets its own event loop
+    registry = default_registry()
+    try:
+        response = await registry.for_model(model).complete(
+            prompt,
+            model,
+            httpx.Timeout(settings.SMALL_MODEL_TIMEOUT, connect=settings.PROVIDER_CONNECT_TIMEOUT)
+        )
+    except ProviderError as e:
+        print(f"STM summary failed: {e}")
+        return None  # The task retries later
+    finally:
+        await registry.close()
+    
+    return response.strip() or None
+
+
+@celery_app.task(
+    name="backend.tasks.memory.embed_ltm_facts",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=30
+)
+def embed_ltm_facts(self, user_id: str) -> int:
+    """
+    Embed a user's LTM facts that have no vector yet
+    
+    Enqueued when a fact is saved and when retrieval finds facts without one,
+    so the chat request path never waits on the embeddings API. Workers pick
+    the vectors up when their fact index is next rebuilt.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                LongTermMemory.id,
+                LongTermMemory.key,
+                LongTermMemory.value,
+                LongTermMemory.description
+            ).where(
+                LongTermMemory.user_id == user_id,
+                LongTermMemory.embedding.is_(None),
+                LongTermMemory.key.not_in(PINNED_LTM_KEYS),
+                LongTermMemory.key.not_like(f"{SUMMARY_KEY_PREFIX}%")
+            )
+        ).all()
+        if not rows:
+            return 0
+        
+        embeddings = asyncio.run(_embed_many([fact_text(row.key, row.value, row.description) for row in rows]))
+        if embeddings is None:
+            raise self.retry()
+        if not embeddings:
+            return 0  # No embeddings provider: retrieval keeps serving facts by recency
+        
+        db.execute(
+            update(LongTermMemory),
+            [{"id": row.id, "embedding": embedding} for row, embedding in zip(rows, embeddings)]
+        )
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+
+
+async def _embed_many(texts: list) -> list:
+    """Embedding vectors; [] when no provider offers embeddings, None if the call failed"""
+    registry = default_registry()
+    try:
+        provider = registry.get("openai")
+        if provider is None or not provider.available:
+            return []
+        return await provider.embed_many(texts)
+    finally:
+        await registry.close()
@@ -0,0 +1,178 @@
+"""
+Small async caches with a shared interface
+In-process LRU/TTL for a single worker, Redis when several workers must agree
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+import redis.asyncio as redis
+from backend.config import settings
+from backend.utils.serialization import dumps, loads
+
+
+class CacheStats:
+    """Hit/miss counters for tuning cache size and TTL"""
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+    
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry"""
+    
+    backend = "memory"
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.stats.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+    
+    async def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+    
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+    
+    async def clear(self):
+        self._entries.clear()
+    
+    def info(self) -> dict:
+        return {
+            "backend": self.backend,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            **self.stats.to_dict()
+        }
+
+
+class RedisCache:
+    """
+    Redis-backed cache shared by all workers
+    Values must be JSON-serializable (datetimes come back as ISO text); Redis errors degrade to cache misses.
+    """
+    
+    backend = "redis"
+    
+    def __init__(self, redis_url: str, namespace: str, ttl_seconds: float = 300):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._redis = redis.from_url(redis_url)
+    
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self._redis.get(self._key(key))
+        except Exception:
+            self.stats.errors += 1
+            raw = None
+        
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        
+        self.stats.hits += 1
+        return loads(raw)
+    
+    async def set(self, key: str, value: Any):
+        try:
+            await self._redis.set(self._key(key), dumps(value), ex=int(self.ttl_seconds))
+        except Exception:
+            self.stats.errors += 1
+    
+    async def delete(self, key: str):
+        try:
+            await self._redis.delete(self._key(key))
+        except Exception:
+            self.stats.errors += 1
+    
+    async def clear(self):
+        try:
+            async for key in self._redis.scan_iter(match=self._key("*")):
+                await self._redis.delete(key)
+        except Exception:
+            self.stats.errors += 1
+    
+    def info(self) -> dict:
+        return {
+            "backend": self.backend,
+            "namespace": self.namespace,
+            "ttl_seconds": self.ttl_seconds,
+            **self.stats.to_dict()
+        }
+
+
+class NullCache:
+    """Cache that never stores anything (caching disabled)"""
+    
+    backend = "none"
+    
+    def __init__(self):
+        self.stats = CacheStats()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        self.stats.misses += 1
+        return None
+    
+    async def set(self, key: str, value: Any):
+        pass
+    
+    async def delete(self, key: str):
+        pass
+    
+    async def clear(self):
+        pass
+    
+    def info(self) -> dict:
+        return {"backend": self.backend, **self.stats.to_dict()}
+
+
+def create_cache(backend: str, namespace: str, max_entries: int, ttl_seconds: float):
+    """
+    Build a cache for the configured backend
+    
+    Args:
+        backend: "memory", "redis" or "none"
+        namespace: Redis key prefix (unused in-process)
+        max_entries: LRU bound for the in-process cache
+        ttl_seconds: Entry lifetime
+    """
+    if backend == "redis":
+        return RedisCache(settings.REDIS_URL, namespace, ttl_seconds)
+    if backend == "none":
+        return NullCache()
+    return TTLCache(max_entries, ttl_seconds)
@@ -0,0 +1,207 @@
+"""
+In-process metrics in the Prometheus text format
+Counters, gauges and histograms with labels, served by GET /metrics. Values
+are per worker process; Prometheus scrapes each worker (or the one it reaches).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Seconds: from a fast DB statement up to a slow large-model reply
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Collectors return (labels, value) pairs when the registry is rendered
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = "untyped"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), collect: Optional[Callable[[], Samples]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: Dict[tuple, float] = {}
+    
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def samples(self) -> List[str]:
+        if self._collect is not None:
+            return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._collect()]
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    
+    type = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; usually read from existing stats at scrape time via `collect`"""
+    
+    type = "gauge"
+    
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observations (durations in seconds) over fixed buckets"""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum, count]
+        self._series: Dict[tuple, list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """All metrics of this process, rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = (), collect: Optional[Callable[[], Samples]] = None) -> Counter:
+        return self.register(Counter(name, help, labelnames, collect))
+    
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), collect: Optional[Callable[[], Samples]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, collect))
+    
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+    
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ("method", "route", "status")
+)
+
+# Stages of one chat turn, to tell database time from model time:
+#   context_build  - STM/LTM reads and prompt assembly (includes the LTM embedding lookup)
+#   admission_wait - waiting for a provider slot
+#   provider_ttft  - provider call until the first delta (streams only)
+#   provider_total - provider call until the full reply, retries and failover included
+#   stm_write      - writing the turn to STM (and trimming it)
+chat_stage_duration = metrics.histogram(
+    "chat_stage_duration_seconds",
+    "Duration of each stage of a chat turn, by model",
+    ("stage", "model")
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests per route template
+    
+    Pure ASGI rather than BaseHTTPMiddleware so streamed responses are timed
+    to their last byte and nothing is buffered. Paths that match no route are
+    reported as "unmatched" to keep label cardinality bounded.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the (shared) scope
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
@@ -0,0 +1,27 @@
+"""
+Opaque cursors for keyset pagination
+A cursor carries the (created_at, id) sort key of the last row of a page;
+the next page starts strictly after it, so deep pages cost the same as the first.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """A page cursor that was not issued by this API"""
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """(created_at, id) of the row the cursor points after"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
@@ -0,0 +1,221 @@
+"""
+Opt-in profiling of live requests
+A request is profiled when PROFILE_ALL_REQUESTS is set or when it carries
+"X-Profile: <PROFILE_TOKEN>"; the profile and the request's SQL statement
+stats are written to PROFILE_DIR. SQL_QUERY_STATS counts and times the
+statements of every request (X-DB-Queries / X-DB-Time-Ms headers) and writes
+a report when one statement repeats often enough to suggest an N+1 pattern.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from backend.config import settings
+
+
+PROFILE_HEADER = b"x-profile"
+
+_query_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """SQL statements executed while handling one request"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        # Statement text -> [executions, seconds]
+        self.statements: Dict[str, list] = {}
+    
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total += seconds
+        entry = self.statements.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+    
+    def repeated(self, threshold: int) -> List[str]:
+        """Statements run at least `threshold` times (likely a query per row)"""
+        return [statement for statement, (count, _) in self.statements.items() if count >= threshold]
+    
+    def to_dict(self) -> dict:
+        return {
+            "queries": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "statements": [
+                {"sql": statement, "count": count, "total_ms": round(seconds * 1000, 3)}
+                for statement, (count, seconds) in sorted(
+                    self.statements.items(), key=lambda item: item[1][1], reverse=True
+                )
+            ]
+        }
+
+
+def instrument_engine(engine):
+    """Time every statement of a (sync) engine into the current request's QueryStats, if any"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _query_stats.get() is not None:
+            context._query_started = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _query_stats.get()
+        started = getattr(context, "_query_started", None)
+        if stats is not None and started is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+
+class CProfileProfiler:
+    """Deterministic profile of the event-loop thread: a .prof file plus a text summary"""
+    
+    def start(self):
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+    
+    def stop(self):
+        self._profile.disable()
+    
+    def write(self, path: str):
+        self._profile.dump_stats(f"{path}.prof")
+        summary = io.StringIO()
+        pstats.Stats(self._profile, stream=summary).sort_stats("cumulative").print_stats(60)
+        with open(f"{path}.txt", "w") as f:
+            f.write(summary.getvalue())
+
+
+class PyinstrumentProfiler:
+    """Sampling profile that attributes await time to the awaiting coroutine: an HTML report"""
+    
+    def start(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(async_mode="enabled")
+        self._profiler.start()
+    
+    def stop(self):
+        self._profiler.stop()
+    
+    def write(self, path: str):
+        with open(f"{path}.html", "w") as f:
+            f.write(self._profiler.output_html())
+
+
+def profiler_class(name: str = "auto"):
+    """
+    Profiler implementation
+    
+    Args:
+        name: "pyinstrument", "cprofile", or "auto" (pyinstrument if installed)
+    """
+    if name in ("auto", "pyinstrument"):
+        try:
+            import pyinstrument  # noqa: F401
+            return PyinstrumentProfiler
+        except ImportError:
+            if name == "pyinstrument":
+                raise
+    return CProfileProfiler
+
+
+def _wants_profile(scope) -> bool:
+    if settings.PROFILE_ALL_REQUESTS:
+        return True
+    if not settings.PROFILE_TOKEN:
+        return False
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return hmac.compare_digest(value, settings.PROFILE_TOKEN.encode())
+    return False
+
+
+def _report_name(scope) -> str:
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{path}-{uuid.uuid4().hex[:6]}"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware for per-request profiles and SQL statement stats
+    
+    Only one request is profiled at a time: profilers hook the whole thread,
+    so concurrent requests would be mixed into one profile. Both profilers see
+    the event-loop thread only; sync (def) endpoints run in the threadpool and
+    show up as time spent waiting on it, while their SQL is still counted.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.profiler_class = profiler_class(settings.PROFILER)
+        self._profiling = False
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        profile = not self._profiling and _wants_profile(scope)
+        if not profile and not settings.SQL_QUERY_STATS:
+            await self.app(scope, receive, send)
+            return
+        
+        name = _report_name(scope)
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        profiler = None
+        if profile:
+            self._profiling = True
+            profiler = self.profiler_class()
+            profiler.start()
+        
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Queries", str(stats.count))
+                headers.append("X-DB-Time-Ms", f"{stats.total * 1000:.1f}")
+                if profiler is not None:
+                    headers.append("X-Profile-Id", name)
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.stop()
+                self._profiling = False
+            _query_stats.reset(token)
+            
+            repeated = stats.repeated(settings.SQL_REPEATED_QUERY_THRESHOLD)
+            if repeated:
+                print(f"Possible N+1 in {scope['method']} {scope['path']}: {len(repeated)} statement(s) "
+                      f"repeated {settings.SQL_REPEATED_QUERY_THRESHOLD}+ times, see {name}.json")
+            if profiler is not None or repeated:
+                await asyncio.to_thread(self._write_report, name, scope, elapsed, stats, profiler)
+    
+    @staticmethod
+    def _write_report(name: str, scope, elapsed: float, stats: QueryStats, profiler):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, name)
+        if profiler is not None:
+            profiler.write(path)
+        with open(f"{path}.json", "w") as f:
+            json.dump({
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode(errors="replace"),
+                "duration_ms": round(elapsed * 1000, 3),
+                "sql": stats.to_dict(),
+                "repeated_statements": stats.repeated(settings.SQL_REPEATED_QUERY_THRESHOLD)
+            }, f, indent=2)
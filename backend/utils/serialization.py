@@ -0,0 +1,68 @@
+"""
+JSON encoding for HTTP responses and WebSocket frames
+orjson when installed (`pip install .[fastjson]`), stdlib json otherwise.
+Datetimes are encoded as ISO 8601 with UTC as "Z", the same text Pydantic
+produces, so ORM rows can become response dicts without isoformat() calls.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    A timestamp in UTC, for response dicts
+    
+    Columns are DateTime(timezone=True) written in UTC, but SQLite returns them
+    naive and PostgreSQL in the session time zone. Normalized, the same row
+    encodes to the same "...Z" text whichever way it was read or written.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    
+    loads = orjson.loads
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+    
+    loads = json.loads
+
+
+def dumps_text(value: Any) -> str:
+    """JSON as str, for text WebSocket frames and SSE data lines"""
+    return dumps(value).decode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with dumps()
+    
+    The app's default response class. Endpoints returning trusted ORM rows
+    return it directly, which also skips FastAPI's response_model validation
+    and jsonable_encoder pass; response_model then only documents the shape.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
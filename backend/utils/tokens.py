@@ -0,0 +1,65 @@
+"""
+Token counting for context budgets
+Uses tiktoken when it is installed, otherwise a fast ~4 characters per token
+estimate. Counts only need to be close: they size the prompt, they are not billed.
+"""
+
+from backend.config import settings
+
+
+# Chat formatting adds a few tokens per message on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ApproximateTokenizer:
+    """About 4 characters per token for English text; no dependencies"""
+    
+    name = "approx"
+    
+    def count(self, text: str) -> int:
+        return (len(text) + 3) // 4
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return text[:max_tokens * 4]
+
+
+class TiktokenTokenizer:
+    """Exact counts for OpenAI encodings (close enough for other providers)"""
+    
+    name = "tiktoken"
+    
+    def __init__(self, encoding: str):
+        import tiktoken
+        self._encoding = tiktoken.get_encoding(encoding)
+    
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+
+
+def create_tokenizer(name: str = "auto", encoding: str = "o200k_base"):
+    """
+    Build a tokenizer
+    
+    Args:
+        name: "tiktoken", "approx", or "auto" (tiktoken if installed)
+        encoding: tiktoken encoding name
+    """
+    if name in ("auto", "tiktoken"):
+        try:
+            return TiktokenTokenizer(encoding)
+        except Exception:  # Not installed, or encoding files unavailable offline
+            if name == "tiktoken":
+                raise
+    return ApproximateTokenizer()
+
+
+tokenizer = create_tokenizer(settings.TOKENIZER, settings.TOKENIZER_ENCODING)
+
+
+def count_tokens(text: str) -> int:
+    """Tokens a message with this content costs in a prompt"""
+    return tokenizer.count(text) + MESSAGE_OVERHEAD_TOKENS
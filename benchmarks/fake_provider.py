@@ -0,0 +1,79 @@
+"""
+Fake model provider for benchmarks
+Answers after a fixed latency, streams at a fixed token rate and fails a
+configurable share of calls, without any network access. Registered in place
+of the real providers (see benchmarks/server.py), so everything from the
+routers down to the resilience layer and STM writes runs as in production.
+"""
+
+import asyncio
+import os
+import random
+from typing import AsyncIterator, Dict, List
+import httpx
+from backend.services.providers import Provider, ProviderUnavailable
+
+
+class FakeProvider(Provider):
+    """
+    Args:
+        name: Provider name to stand in for ("openai", "anthropic")
+        latency_ms: Time until a non-streamed reply
+        ttft_ms: Time until the first streamed delta
+        tokens_per_second: Streaming rate after the first delta
+        response_tokens: Words in each reply
+        error_rate: Share of calls (0-1) failing with ProviderUnavailable
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        latency_ms: float = 200,
+        ttft_ms: float = 100,
+        tokens_per_second: float = 50,
+        response_tokens: int = 60,
+        error_rate: float = 0.0
+    ):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+    
+    @classmethod
+    def from_env(cls, name: str) -> "FakeProvider":
+        """Configured by the FAKE_PROVIDER_* variables benchmarks.load passes to the server"""
+        return cls(
+            name,
+            latency_ms=float(os.environ.get("FAKE_PROVIDER_LATENCY_MS", 200)),
+            ttft_ms=float(os.environ.get("FAKE_PROVIDER_TTFT_MS", 100)),
+            tokens_per_second=float(os.environ.get("FAKE_PROVIDER_TOKENS_PER_SECOND", 50)),
+            response_tokens=int(os.environ.get("FAKE_PROVIDER_RESPONSE_TOKENS", 60)),
+            error_rate=float(os.environ.get("FAKE_PROVIDER_ERROR_RATE", 0))
+        )
+    
+    def _words(self, model: str) -> List[str]:
+        return [f"{model}-token-{i}" for i in range(self.response_tokens)]
+    
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            raise ProviderUnavailable(self.name, f"Injected {self.name} failure")
+    
+    async def complete(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> str:
+        await asyncio.sleep(self.latency_ms / 1000)
+        self._maybe_fail()
+        return " ".join(self._words(model))
+    
+    async def stream(self, messages: List[Dict], model: str, timeout: httpx.Timeout) -> AsyncIterator[str]:
+        await asyncio.sleep(self.ttft_ms / 1000)
+        self._maybe_fail()
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for i, word in enumerate(self._words(model)):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield word if i == 0 else f" {word}"
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark
+Cost of turning N task rows into a JSON response, and of encoding WebSocket frames
+
+Paths:
+  legacy  - to_dict() with isoformat() per timestamp, returned through
+            response_model=List[TaskResponse] (validation, jsonable_encoder,
+            stdlib json.dumps)
+  fast    - Task.to_dict() returned as FastJSONResponse (orjson when installed),
+            no response_model pass
+
+Each path is timed twice: "encode" is rows to response bytes only, "request"
+is a full in-process GET through a minimal FastAPI app. Rows are built in
+memory, so no database time is included.
+
+Usage:
+  python -m benchmarks.serialization --sizes 100 1000 10000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50, help="Timed runs per size and path")
+    parser.add_argument("--frames", type=int, default=10000, help="WebSocket frames encoded and decoded")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+# Models import the database module, which needs a URL; nothing is written to it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/serialization_bench.db")
+os.environ.setdefault("SQL_ECHO", "False")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from backend.models.task import Task  # noqa: E402
+from backend.schemas.task import TaskResponse  # noqa: E402
+from backend.utils import serialization  # noqa: E402
+from backend.utils.serialization import FastJSONResponse, dumps_text, loads  # noqa: E402
+
+
+def legacy_to_dict(task: Task) -> dict:
+    """Task.to_dict() before the fast path, kept here as the baseline"""
+    return {
+        "id": task.id,
+        "user_id": task.user_id,
+        "title": task.title,
+        "description": task.description,
+        "completed": task.completed,
+        "createdAt": task.created_at.isoformat() if task.created_at else None,
+        "updatedAt": task.updated_at.isoformat() if task.updated_at else None
+    }
+
+
+def make_tasks(count: int) -> List[Task]:
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    return [
+        Task(
+            id=str(uuid.uuid4()),
+            user_id="bench_user",
+            title=f"Benchmark task {i}",
+            description="Created by benchmarks.serialization" if i % 2 else None,
+            completed=i % 3 == 0,
+            created_at=start + timedelta(seconds=i),
+            updated_at=start + timedelta(seconds=i, minutes=5) if i % 3 == 0 else None
+        )
+        for i in range(count)
+    ]
+
+
+def build_app(tasks: List[Task]) -> FastAPI:
+    # Plain JSONResponse, as the app used before FastJSONResponse became its default
+    app = FastAPI(default_response_class=JSONResponse)
+    
+    @app.get("/legacy", response_model=List[TaskResponse])
+    def legacy():
+        return [legacy_to_dict(task) for task in tasks]
+    
+    @app.get("/fast", response_model=List[TaskResponse])
+    def fast():
+        return FastJSONResponse([task.to_dict() for task in tasks])
+    
+    return app
+
+
+async def encode_legacy(app: FastAPI, tasks: List[Task]) -> bytes:
+    """What FastAPI does with the legacy return value: validate, encode, dump"""
+    route = next(route for route in app.routes if getattr(route, "path", None) == "/legacy")
+    content = await serialize_response(field=route.response_field, response_content=[legacy_to_dict(task) for task in tasks])
+    return JSONResponse(content).body
+
+
+async def encode_fast(app: FastAPI, tasks: List[Task]) -> bytes:
+    return FastJSONResponse([task.to_dict() for task in tasks]).body
+
+
+def summarize(timings: List[float]) -> dict:
+    ordered = sorted(timings)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+    }
+
+
+async def time_async(fn, repeat: int) -> List[float]:
+    await fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def run_size(size: int, repeat: int) -> List[dict]:
+    tasks = make_tasks(size)
+    app = build_app(tasks)
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Same documents either way
+        legacy_body, fast_body = (await client.get("/legacy")).json(), (await client.get("/fast")).json()
+        assert legacy_body == fast_body, "legacy and fast responses differ"
+        
+        for path, encode in (("legacy", encode_legacy), ("fast", encode_fast)):
+            encode_timings = await time_async(lambda: encode(app, tasks), repeat)
+            request_timings = await time_async(lambda: client.get(f"/{path}"), repeat)
+            results.append({
+                "path": path,
+                "rows": size,
+                "response_bytes": len((await client.get(f"/{path}")).content),
+                "encode": summarize(encode_timings),
+                "request": summarize(request_timings),
+            })
+    return results
+
+
+def run_frames(count: int) -> List[dict]:
+    """Encode and decode chat delta frames, as the WebSocket handler does per message"""
+    frame = {"type": "delta", "content": " token", "conversation_id": str(uuid.uuid4()), "request_id": str(uuid.uuid4())}
+    results = []
+    for codec, encode, decode in (("stdlib", json.dumps, json.loads), ("fast", dumps_text, loads)):
+        started = time.perf_counter()
+        for _ in range(count):
+            decode(encode(frame))
+        elapsed = time.perf_counter() - started
+        results.append({"codec": codec, "frames": count, "us_per_frame": round(elapsed / count * 1e6, 3)})
+    return results
+
+
+async def main():
+    results = []
+    for size in ARGS.sizes:
+        for result in await run_size(size, ARGS.repeat):
+            results.append(result)
+            print(
+                f"{result['path']:>6} rows={size:<6} encode p50={result['encode']['p50_ms']:>8.2f}ms "
+                f"request p50={result['request']['p50_ms']:>8.2f}ms p95={result['request']['p95_ms']:>8.2f}ms",
+                file=sys.stderr
+            )
+    frames = run_frames(ARGS.frames)
+    for result in frames:
+        print(f"{result['codec']:>6} websocket frame encode+decode {result['us_per_frame']:.2f}us", file=sys.stderr)
+    print(json.dumps({
+        "benchmark": "serialization",
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+        "results": results,
+        "websocket_frames": frames
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,16 @@
+"""
+The backend app with fake model providers, for benchmarks.load
+
+    FAKE_PROVIDER_LATENCY_MS=200 uvicorn benchmarks.server:app
+
+Every provider the app would call is replaced by a FakeProvider configured
+from the FAKE_PROVIDER_* environment variables.
+"""
+
+from backend.main import app  # noqa: F401
+from backend.services.ai_service import ai_service
+from benchmarks.fake_provider import FakeProvider
+
+
+for name in ("openai", "anthropic"):
+    ai_service.providers.register(FakeProvider.from_env(name))
@@ -30,8 +30,9 @@ export interface ChatMessage {
 
 export interface WSMessage {
   message: string;
-  model_size?: "small" | "medium" | "large";
+  model_size?: "small" | "medium" | "large" | "auto";
   conversation_id?: string;
+  request_id?: string;
 }
 
 export interface WSResponse {
@@ -40,6 +41,7 @@ export interface WSResponse {
   content: string;
   model_used: string;
   conversation_id: string;
+  request_id?: string;
   error?: string;
 }
 
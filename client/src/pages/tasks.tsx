@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { TaskCard } from "@/components/task-card";
 import { TaskDialog } from "@/components/task-dialog";
 import { Button } from "@/components/ui/button";
@@ -16,6 +16,26 @@ interface Task {
   created_at?: string;
 }
 
+interface TaskPage {
+  tasks: Task[];
+  nextCursor: string | null;
+}
+
+// GET /api/tasks returns one page at a time; X-Next-Cursor fetches the next one
+async function fetchTaskPage({ pageParam }: { pageParam: string | null }): Promise<TaskPage> {
+  const url = pageParam
+    ? `/api/tasks/?cursor=${encodeURIComponent(pageParam)}`
+    : "/api/tasks/";
+  const res = await fetch(url, { credentials: "include" });
+  if (!res.ok) {
+    throw new Error(`${res.status}: ${(await res.text()) || res.statusText}`);
+  }
+  return {
+    tasks: (await res.json()) as Task[],
+    nextCursor: res.headers.get("X-Next-Cursor"),
+  };
+}
+
 export default function Tasks() {
   const [dialogOpen, setDialogOpen] = useState(false);
   const [dialogMode, setDialogMode] = useState<"create" | "edit">("create");
@@ -23,10 +43,16 @@ export default function Tasks() {
   const queryClient = useQueryClient();
   const { toast } = useToast();
 
-  // Fetch tasks
-  const { data: tasks = [], isLoading } = useQuery<Task[]>({
+  // Fetch tasks: the first page up front, later pages on "Load more"
+  const { data, isLoading, hasNextPage, fetchNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ["/api/tasks"],
+    queryFn: fetchTaskPage,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
   });
+  const tasks = data?.pages.flatMap((page) => page.tasks) ?? [];
+  // Tab counts cover the loaded pages only
+  const more = hasNextPage ? "+" : "";
 
   // Create task mutation
   const createMutation = useMutation({
@@ -158,13 +184,13 @@ export default function Tasks() {
         <Tabs defaultValue="all" className="w-full">
           <TabsList className="grid w-full max-w-md grid-cols-3">
             <TabsTrigger value="all" data-testid="tab-all">
-              All ({tasks.length})
+              All ({tasks.length}{more})
             </TabsTrigger>
             <TabsTrigger value="active" data-testid="tab-active">
-              Active ({activeTasks.length})
+              Active ({activeTasks.length}{more})
             </TabsTrigger>
             <TabsTrigger value="completed" data-testid="tab-completed">
-              Completed ({completedTasks.length})
+              Completed ({completedTasks.length}{more})
             </TabsTrigger>
           </TabsList>
 
@@ -223,6 +249,20 @@ export default function Tasks() {
           </TabsContent>
         </Tabs>
 
+        {hasNextPage && (
+          <div className="flex justify-center">
+            <Button
+              variant="outline"
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+              data-testid="button-load-more-tasks"
+            >
+              {isFetchingNextPage && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Load more
+            </Button>
+          </div>
+        )}
+
         <TaskDialog
           open={dialogOpen}
           onOpenChange={(open) => {
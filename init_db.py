@@ -1,22 +1,40 @@
 #!/usr/bin/env python3
 """
 Database initialization script
-Creates all tables and sets up initial data
+Brings the schema up to date with Alembic migrations
 """
 
-from backend.database import engine, Base
-from backend.models import ShortTermMemory, LongTermMemory, Task, Preference
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from backend.database import engine
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+# First revision, matching the tables create_all used to build at startup
+BASELINE_REVISION = "0001"
+
 
 def init_database():
-    """Initialize database tables"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✓ Database tables created successfully!")
-    print("\nTables created:")
+    """Run pending migrations"""
+    config = Config(str(ALEMBIC_INI))
+    tables = inspect(engine).get_table_names()
+    
+    # Databases created before migrations existed: adopt them at the baseline revision
+    if "short_term_memory" in tables and "alembic_version" not in tables:
+        print(f"Existing schema without migration history, stamping revision {BASELINE_REVISION}...")
+        command.stamp(config, BASELINE_REVISION)
+    
+    print("Applying database migrations...")
+    command.upgrade(config, "head")
+    print("✓ Database schema is up to date!")
+    print("\nTables:")
     print("  - short_term_memory (STM)")
     print("  - long_term_memory (LTM)")
     print("  - tasks")
     print("  - preferences")
+    print("  - activity_events")
     
 
 if __name__ == "__main__":